@@ -0,0 +1,272 @@
+import numpy as np
+
+from config import *
+from simulation import Stone
+
+# --- NumPy 版の物理演算 (構造体配列) ---
+#
+# 全盤面・全ストーンの位置/速度/停止/場外フラグを (boards, stones[, 2]) の
+# 配列で持ち、摩擦・壁の跳ね返り・衝突を一括で計算する。
+# 衝突は simulation.resolve_collisions と同じ (i, j) 順に処理するので、
+# 1盤面ずつ Python 版で動かした結果と位置・速度とも 1e-6 px 以内で一致する。
+# 全ストーンが止まった盤面と、動くストーンから離れた組は計算しない。
+
+TEAM_RED, TEAM_YELLOW = 0, 1
+
+class BatchPhysics:
+  def __init__(self, pos, vel=None, stopped=None, out_of_play=None, teams=None):
+    self.pos = np.array(pos, dtype=np.float64)
+    if self.pos.ndim == 2: self.pos = self.pos[None]
+    boards, n = self.pos.shape[:2]
+    self.vel = np.zeros_like(self.pos) if vel is None else np.array(
+        vel, dtype=np.float64).reshape(boards, n, 2)
+    self.stopped = np.ones((boards, n), bool) if stopped is None else np.array(
+        stopped, bool).reshape(boards, n)
+    self.out_of_play = np.zeros((boards, n), bool) if out_of_play is None else np.array(
+        out_of_play, bool).reshape(boards, n)
+    self.teams = np.zeros((boards, n), np.int8) if teams is None else np.broadcast_to(
+        np.asarray(teams, np.int8), (boards, n)).copy()
+    self.angle = np.zeros((boards, n))
+    # Stone.awake と同じく、押し戻された直後のストーンは止まっていても衝突判定に含める
+    self.awake = np.ones((boards, n), bool)
+    self.frames = 0
+    # CurlingSimulation.substeps と同じく、1ステップを何回に刻んで物理を進めるか
+    self.substeps = PHYSICS_SUBSTEPS
+
+  @property
+  def shape(self):
+    return self.pos.shape[:2]
+
+  @classmethod
+  def from_stones(cls, stones, boards=1):
+    """ Stone のリストを boards 枚の同じ盤面に複製する """
+    n = len(stones)
+    pos = np.array([(s.pos.x, s.pos.y) for s in stones], np.float64).reshape(n, 2)
+    vel = np.array([(s.vel.x, s.vel.y) for s in stones], np.float64).reshape(n, 2)
+    phys = cls(np.broadcast_to(pos, (boards, n, 2)),
+               np.broadcast_to(vel, (boards, n, 2)),
+               np.broadcast_to([s.stopped for s in stones], (boards, n)),
+               np.broadcast_to([s.out_of_play for s in stones], (boards, n)),
+               [TEAM_RED if s.color == RED else TEAM_YELLOW for s in stones])
+    phys.angle[:] = [s.angle for s in stones]
+    phys.awake[:] = [s.awake for s in stones]
+    return phys
+
+  def to_stones(self, board=0):
+    stones = []
+    for i in range(self.shape[1]):
+      s = Stone(*self.pos[board, i], RED if self.teams[board, i] == TEAM_RED else YELLOW)
+      s.vel.update(*self.vel[board, i])
+      s.stopped = bool(self.stopped[board, i])
+      s.out_of_play = bool(self.out_of_play[board, i])
+      s.angle = float(self.angle[board, i])
+      s.awake = bool(self.awake[board, i])
+      stones.append(s)
+    return stones
+
+  def is_settled(self):
+    """ 盤面ごとに全ストーンが止まったかを返す (boards,) """
+    return self.stopped.all(axis=1)
+
+  def step(self, friction=FRICTION_NORMAL):
+    """ 全盤面を1ステップ進める。friction はスカラーか (boards, stones) に
+    ブロードキャストできる配列 """
+    friction = np.broadcast_to(friction, self.stopped.shape)
+    h = 1 / self.substeps
+    for _ in range(self.substeps):
+      moving = ~self.stopped
+      if moving.any(): self._integrate(moving, friction, h)
+      self.resolve_collisions()
+    self.frames += 1
+    return self.is_settled()
+
+  def _integrate(self, moving, friction, h=1):
+    """ Stone.update と同じく h ステップ分を閉じた式で動かす """
+    pos, vel = self.pos, self.vel
+    f = friction[moving][:, None]
+    if h == 1:
+      pos[moving] += vel[moving]
+      vel[moving] *= f
+    else:
+      pos[moving] += vel[moving] * ((1 - f ** h) / (1 - f))
+      vel[moving] *= f ** h
+    speed = np.sqrt(vel[..., 0] * vel[..., 0] + vel[..., 1] * vel[..., 1])
+    self.angle[moving] -= speed[moving] * 5 * h
+    stop = moving & (speed < STOP_SPEED)
+    vel[stop] = 0
+    self.stopped |= stop
+
+    x, y = pos[..., 0], pos[..., 1]
+    vx, vy = vel[..., 0], vel[..., 1]
+    left = moving & (x < PLAY_MIN_X + STONE_RADIUS)
+    right = moving & ~left & (x > PLAY_MAX_X - STONE_RADIUS)
+    x[left] = PLAY_MIN_X + STONE_RADIUS; vx[left] *= WALL_BOUNCE
+    x[right] = PLAY_MAX_X - STONE_RADIUS; vx[right] *= WALL_BOUNCE
+    top = moving & (y < 0)
+    y[top] = 0; vy[top] *= WALL_BOUNCE
+    gone = moving & (y > WORLD_H)
+    self.stopped |= gone
+    self.out_of_play |= gone
+
+  def candidate_pairs(self, rows, active):
+    """ rows の盤面のどれかで接触しうる (i, j) の組。動いているストーンか、
+    その近く (押し戻しの連鎖が届く 4R 以内) にあるストーンを含む組だけを返す """
+    n = self.shape[1]
+    if n < 2: return []
+    reach = (STONE_RADIUS * 4) ** 2
+    pos = self.pos[rows]
+    live = ~self.out_of_play[rows]
+    cols = np.nonzero(active.any(axis=0))[0]
+    d = pos[:, cols, None, :] - pos[:, None, :, :]
+    near = ((d * d).sum(axis=-1) < reach) & active[:, cols, None] & live[:, None, :]
+    involved = active | near.any(axis=1)
+    iu, ju = np.triu_indices(n, 1)
+    inv_cols = involved.any(axis=0)
+    keep = inv_cols[iu] | inv_cols[ju]
+    iu, ju = iu[keep], ju[keep]
+    d = pos[:, iu] - pos[:, ju]
+    near = ((d * d).sum(axis=-1) < reach) & live[:, iu] & live[:, ju]
+    hit = (near & (involved[:, iu] | involved[:, ju])).any(axis=0)
+    return list(zip(iu[hit].tolist(), ju[hit].tolist()))
+
+  def resolve_collisions(self):
+    active = (~self.stopped | self.awake) & ~self.out_of_play
+    rows = np.nonzero(active.any(axis=1))[0]
+    if rows.size == 0: return
+    pairs = self.candidate_pairs(rows, active[rows])
+    self.awake[rows] = False
+    pos, vel = self.pos, self.vel
+    for i, j in pairs:
+      d = pos[rows, i] - pos[rows, j]
+      dist = np.sqrt(d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1])
+      hit = (dist < STONE_RADIUS * 2) & ~(self.out_of_play[rows, i] | self.out_of_play[rows, j])
+      if not hit.any(): continue
+      b = rows[hit]
+      d, dist = d[hit], dist[hit]
+      zero = dist == 0
+      d[zero] = (1, 0); dist[zero] = 1
+      normal = d / dist[:, None]
+      push = normal * ((STONE_RADIUS * 2 - dist) * 0.5)[:, None]
+      pos[b, i] += push; pos[b, j] -= push
+      self.awake[b, i] = True; self.awake[b, j] = True
+      rel = vel[b, i] - vel[b, j]
+      van = (rel * normal).sum(axis=1)
+      bounce = van < 0
+      if not bounce.any(): continue
+      bb = b[bounce]
+      impulse = normal[bounce] * (-RESTITUTION * van[bounce] / 2)[:, None]
+      vel[bb, i] += impulse; vel[bb, j] -= impulse
+      self.stopped[bb, i] = False; self.stopped[bb, j] = False
+
+  def scores(self):
+    """ get_score と同じ規則で盤面ごとの (赤, 黄) 得点を返す (boards, 2) """
+    boards, n = self.shape
+    out = np.zeros((boards, 2), np.int64)
+    if n == 0: return out
+    d = self.pos - (SCREEN_W // 2, TARGET_Y)
+    dist = np.sqrt(d[..., 0] * d[..., 0] + d[..., 1] * d[..., 1])
+    valid = ~self.out_of_play & (self.pos[..., 1] < WORLD_H / 2)
+    dist[~valid] = np.inf
+    order = np.argsort(dist, axis=1, kind="stable")
+    teams = np.take_along_axis(self.teams, order, axis=1)
+    ok = np.take_along_axis(valid, order, axis=1)
+    run = np.cumprod(ok & (teams == teams[:, :1]), axis=1).sum(axis=1)
+    has = valid.any(axis=1)
+    winner = teams[:, 0].astype(np.int64)
+    out[has, winner[has]] = run[has]
+    return out
+
+FAST_FORWARD_EVERY = 4
+# throw_stones が stop() を確かめる間隔 (ステップ)
+STOP_CHECK_EVERY = 32
+
+def fast_forward(phys, friction):
+  """ どのストーンも他のストーン・壁に届かないと保証できるフレーム数だけ、
+  盤面ごとに閉じた式で一気に進める (保守的前進法)。friction は (boards, stones) """
+  boards, n = phys.shape
+  moving = ~phys.stopped & ~phys.out_of_play
+  rows = np.nonzero(moving.any(axis=1) & ~phys.awake.any(axis=1))[0]
+  if rows.size == 0: return
+  pos, vel, f = phys.pos[rows], phys.vel[rows], friction[rows]
+  mov = moving[rows]
+  speed = np.where(mov, np.sqrt(vel[..., 0] * vel[..., 0] + vel[..., 1] * vel[..., 1]), 0)
+  f_slow = np.where(mov, f, 0).max(axis=1)
+  # 進める距離の上限: ストーン同士の隙間と壁までの距離
+  limit = np.full(rows.size, np.inf)
+  live = ~phys.out_of_play[rows]
+  if n > 1:
+    d = pos[:, :, None, :] - pos[:, None, :, :]
+    gap = np.sqrt((d * d).sum(axis=-1)) - STONE_RADIUS * 2
+    both = speed[:, :, None] + speed[:, None, :]
+    pair = live[:, :, None] & live[:, None, :] & (both > 0)
+    pair &= ~np.eye(n, dtype=bool)
+    limit = np.minimum(limit, np.where(pair, gap / np.where(pair, both, 1), np.inf).min(axis=(1, 2)))
+  vx, vy = vel[..., 0], vel[..., 1]
+  walls = [(vx < 0, (pos[..., 0] - PLAY_MIN_X - STONE_RADIUS) / -np.where(vx < 0, vx, -1)),
+           (vx > 0, (PLAY_MAX_X - STONE_RADIUS - pos[..., 0]) / np.where(vx > 0, vx, 1)),
+           (vy < 0, pos[..., 1] / -np.where(vy < 0, vy, -1)),
+           (vy > 0, (WORLD_H - pos[..., 1]) / np.where(vy > 0, vy, 1))]
+  for toward, u in walls:
+    limit = np.minimum(limit, np.where(mov & toward, u, np.inf).min(axis=1))
+  # k と stop は刻み (1/substeps ステップ) の回数。閉じた式には t = 回数 * h ステップを渡す
+  h = 1 / phys.substeps
+  reach = 1 - limit * (1 - f_slow)
+  k = np.where(reach > 0, np.floor(np.log(np.maximum(reach, 1e-300)) / np.log(f_slow) / h), np.inf)
+  k = np.minimum(k, 1e6)
+  go = k >= 2
+  if not go.any(): return
+  rows, k, f, mov, speed, vel = rows[go], k[go, None], f[go], mov[go], speed[go], vel[go]
+  stop = np.ceil(np.log(STOP_SPEED / np.where(speed > 0, speed, 1)) / np.log(f) / h)
+  stop = np.where(speed * f ** h < STOP_SPEED, 1, stop)
+  n = np.where(mov, np.minimum(k, stop), 0)
+  decay = f ** (n * h)
+  g = (1 - decay) / (1 - f)
+  phys.pos[rows] += vel * g[..., None]
+  if h == 1: phys.angle[rows] -= speed * f * g * 5
+  else: phys.angle[rows] -= speed * 5 * h * f ** h * (1 - decay) / (1 - f ** h)
+  ended = mov & (n >= stop)
+  phys.vel[rows] = np.where(ended[..., None], 0, vel * decay[..., None])
+  phys.stopped[rows] |= ended
+
+def throw_stones(phys, xs, powers, team, sweep=None, max_steps=20000, stop=None):
+  """ 盤面ごとに (xs, powers) で1投ずつ投げ、全盤面が止まるまで進めた新しい
+  BatchPhysics を返す。投げたストーンは最後の列。
+  sweep は bool / (boards,) の常時スイープ / (steps, boards) の予定表 / 関数。
+  常時スイープなら、ストーン同士や壁が近づかない区間は閉じた式で飛ばす。
+  stop() が True を返したら途中でやめて None を返す """
+  boards, n = phys.shape
+  xs = np.broadcast_to(np.asarray(xs, np.float64), (boards,))
+  powers = np.broadcast_to(np.asarray(powers, np.float64), (boards,))
+  out = BatchPhysics(np.concatenate([phys.pos, np.zeros((boards, 1, 2))], axis=1),
+                     np.concatenate([phys.vel, np.zeros((boards, 1, 2))], axis=1),
+                     np.concatenate([phys.stopped, np.zeros((boards, 1), bool)], axis=1),
+                     np.concatenate([phys.out_of_play, np.zeros((boards, 1), bool)], axis=1),
+                     np.concatenate([phys.teams, np.full((boards, 1), team, np.int8)], axis=1))
+  out.angle[:, :n] = phys.angle
+  out.awake[:, :n] = phys.awake
+  out.substeps = phys.substeps
+  out.pos[:, -1] = np.stack([np.clip(xs, PLAY_MIN_X + STONE_RADIUS, PLAY_MAX_X - STONE_RADIUS),
+                             np.full(boards, float(START_Y))], axis=1)
+  out.vel[:, -1, 1] = -powers
+  friction = np.full(out.shape, FRICTION_NORMAL)
+  schedule = None if sweep is None or callable(sweep) else np.asarray(sweep, bool)
+  if schedule is not None and schedule.ndim < 2:
+    friction[:, -1] = np.where(schedule, FRICTION_SWEEP, FRICTION_NORMAL)
+  skip = not callable(sweep) and (schedule is None or schedule.ndim < 2)
+  for step in range(max_steps):
+    if stop is not None and step % STOP_CHECK_EVERY == 0 and stop(): return None
+    if skip and step % FAST_FORWARD_EVERY == 0: fast_forward(out, friction)
+    if callable(sweep): on = sweep(step)
+    elif schedule is not None and schedule.ndim == 2:
+      on = schedule[step] if step < len(schedule) else False
+    else: on = None
+    if on is not None: friction[:, -1] = np.where(on, FRICTION_SWEEP, FRICTION_NORMAL)
+    if out.step(friction).all(): break
+  return out
+
+def simulate_shots(stones, xs, powers, color, sweep=None, max_steps=20000, stop=None):
+  """ 同じ盤面 stones から候補ショット (xs, powers) を盤面ごとに1投ずつ投げる """
+  xs = np.atleast_1d(np.asarray(xs, np.float64))
+  phys = BatchPhysics.from_stones(stones, len(xs))
+  team = TEAM_RED if color == RED else TEAM_YELLOW
+  return throw_stones(phys, xs, powers, team, sweep, max_steps, stop)
@@ -0,0 +1,51 @@
+""" 衝突判定のスケーリング計測: 総当たり vs 一様グリッド
+
+  python benchmarks/bench_collisions.py [--repeat 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from config import *
+from simulation import Stone, Vector2, resolve_collisions, resolve_collisions_all_pairs
+
+COUNTS = [8, 32, 128, 500]
+
+def make_board(n, moving):
+  """ 重ならない格子状にストーンを並べ、先頭 moving 個だけ動かす """
+  cols = max(1, int((PLAY_MAX_X - PLAY_MIN_X) // (STONE_RADIUS * 2.5)))
+  stones = []
+  for i in range(n):
+    x = PLAY_MIN_X + STONE_RADIUS + (i % cols) * STONE_RADIUS * 2.5
+    y = STONE_RADIUS + (i // cols) * STONE_RADIUS * 2.5
+    s = Stone(x, y, RED if i % 2 else YELLOW)
+    s.awake = False
+    stones.append(s)
+  for s in stones[:moving]:
+    s.vel = Vector2(0, -10); s.stopped = False
+  return stones
+
+def time_pass(fn, stones, repeat):
+  t = time.perf_counter()
+  for _ in range(repeat): fn(stones)
+  return (time.perf_counter() - t) / repeat
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--repeat", type=int, default=200)
+  args = parser.parse_args()
+
+  print(f"{'stones':>6} {'moving':>6} {'all pairs (us)':>15} {'grid (us)':>10} {'speedup':>8}")
+  for n in COUNTS:
+    for moving in (0, 1, n):
+      stones = make_board(n, moving)
+      repeat = max(3, args.repeat * 8 // n)
+      brute = time_pass(resolve_collisions_all_pairs, stones, repeat)
+      grid = time_pass(resolve_collisions, stones, repeat)
+      print(f"{n:>6} {moving:>6} {brute * 1e6:>15.1f} {grid * 1e6:>10.1f} {brute / grid:>7.1f}x")
+
+if __name__ == "__main__":
+  main()
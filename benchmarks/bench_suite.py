@@ -0,0 +1,268 @@
+""" 物理・ボット・描画のベンチマーク (SDL_VIDEODRIVER=dummy で動く)
+
+  python benchmarks/bench_suite.py [--quick] [--only physics,render] [--render-scale 0.75] [--out result.json]
+                                   [--save-baseline base.json] [--baseline base.json --tolerance 0.15]
+
+シナリオはすべてシードで固定している。--baseline と比べて tolerance 以上
+遅くなった項目があれば終了コード 1 (描画を測るときに基準と --render-scale が違えば
+比べずに終了コード 2)。benchmarks/baseline.json が保存済みの基準
+(1 CPU の開発機で測ったもの。別の機械では --save-baseline で作り直す)。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+import pygame as pg
+
+from config import *
+from simulation import Stone, Vector2, resolve_collisions
+
+SEED = 1234
+# ストーン数 → 1回に進めるステップ数
+PHYSICS_STEPS = {8: 200, 64: 200, 512: 10}
+# scatter_board で上下の端から空ける距離 (動いてシートの外へ出ないように)
+SCATTER_MARGIN = 300
+
+def best_rate(fn, units, repeat, setup=None):
+  """ fn(setup()) を repeat 回測って一番速い回の units / 秒 (setup の時間は含めない) """
+  times = []
+  for _ in range(repeat):
+    args = (setup(),) if setup else ()
+    t = time.perf_counter(); fn(*args); times.append(time.perf_counter() - t)
+  return units / min(times)
+
+def median_ms(fn, repeat):
+  times = []
+  for _ in range(repeat):
+    t = time.perf_counter(); fn(); times.append(time.perf_counter() - t)
+  return statistics.median(times) * 1000
+
+# --- 物理 ---
+
+def scatter_board(n, rng):
+  """ 格子状に n 個並べ、全部をランダムな速さで動かす。シートの縦 (端から SCATTER_MARGIN を
+  除いた範囲) に収まらない分は、ずらした格子で上から重ねる (512 個はシートに重ならずには
+  入らないので、詰め込んだ盤面の負荷になる) """
+  step = STONE_RADIUS * 2.2
+  cols = max(1, int((PLAY_MAX_X - PLAY_MIN_X) // step))
+  per = cols * int((WORLD_H - 2 * SCATTER_MARGIN) // step)
+  layers = (n - 1) // per + 1
+  stones = []
+  for i in range(n):
+    layer, k = divmod(i, per)
+    off = layer * step / layers
+    x = PLAY_MIN_X + STONE_RADIUS + (k % cols) * step + off / 2
+    y = SCATTER_MARGIN + (k // cols) * step + off
+    s = Stone(x, y, RED if i % 2 else YELLOW)
+    s.vel = Vector2(rng.uniform(-3, 3), rng.uniform(-3, 3)); s.stopped = False
+    stones.append(s)
+  assert all(PLAY_MIN_X + STONE_RADIUS <= s.pos.x <= PLAY_MAX_X - STONE_RADIUS
+             and 0 <= s.pos.y <= WORLD_H for s in stones)
+  return stones
+
+def break_board(rng):
+  """ ハウスに詰めた 15 個へ速いストーンを1つ当てる (ブレイク) """
+  stones = []
+  cx = SCREEN_W // 2
+  for row in range(5):
+    for k in range(row + 1):
+      x = cx + (k - row / 2) * STONE_RADIUS * 2.05
+      y = TARGET_Y - row * STONE_RADIUS * 1.8
+      s = Stone(x + rng.uniform(-1, 1), y, RED if (row + k) % 2 else YELLOW)
+      s.awake = False
+      stones.append(s)
+  shooter = Stone(cx + rng.uniform(-5, 5), TARGET_Y + 600, YELLOW)
+  shooter.vel = Vector2(0, -POWER_MAX); shooter.stopped = False
+  return stones + [shooter]
+
+def run_steps(stones, steps):
+  for _ in range(steps):
+    for s in stones: s.update(FRICTION_NORMAL)
+    resolve_collisions(stones)
+
+def bench_physics(results, args):
+  repeat = 3 if args.quick else 7
+  for n, steps in PHYSICS_STEPS.items():
+    rate = best_rate(lambda stones: run_steps(stones, steps), steps, repeat,
+                     lambda: scatter_board(n, random.Random(SEED)))
+    # 全部がシートの上に残ったまま測れていること
+    stones = scatter_board(n, random.Random(SEED)); run_steps(stones, steps)
+    assert not any(s.out_of_play for s in stones), f"physics_{n}: stones left the sheet"
+    results[f"physics_{n}_steps_per_s"] = (rate, "steps/s", True)
+
+  def run_break(stones):
+    frames = 0
+    while not all(s.stopped for s in stones) and frames < 3000:
+      for s in stones: s.update(FRICTION_NORMAL)
+      resolve_collisions(stones); frames += 1
+    run_break.frames = frames
+  rate = best_rate(run_break, 1, repeat, lambda: break_board(random.Random(SEED)))
+  results["break_until_settled_ms"] = (1000 / rate, "ms", False)
+  results["break_steps_per_s"] = (rate * run_break.frames, "steps/s", True)
+
+# --- ボット ---
+
+def bench_bot(results, args):
+  import bot
+  rng = random.Random(SEED)
+  boards = []
+  for k in range(8):
+    stones = [Stone(SCREEN_W // 2 + rng.uniform(-150, 150), TARGET_Y + rng.uniform(-200, 300),
+                    RED if i % 2 else YELLOW) for i in range(k)]
+    boards.append(stones)
+  repeat = 20 if args.quick else 100
+  results["bot_heuristic_ms"] = (median_ms(lambda: [bot.calculate_bot_strategy(b, 3, rng) for b in boards],
+                                           repeat) / len(boards), "ms", False)
+  bot.warm_up()
+  try:
+    for difficulty in (1, 2, 3):
+      ms = median_ms(lambda: bot.plan_shot(boards[4], difficulty, seed=SEED), 2 if args.quick else 5)
+      results[f"bot_plan_d{difficulty}_ms"] = (ms, "ms", False)
+  finally:
+    bot.shutdown()
+
+# --- 描画 ---
+
+def bench_render(results, args):
+  """ 3D は --render-scale の倍率に固定した描画先に描いて広げる (省略時は 100%) """
+  import main
+  from ice import IceProjector, load_ice_texture
+  from render_scale import ResolutionScaler
+  from dirty_rects import DirtyRects
+  pg.init()
+  screen = pg.display.set_mode((SCREEN_W, SCREEN_H))
+  ice_texture = load_ice_texture(SCREEN_W, SCREEN_H)
+  scaler = ResolutionScaler(fixed=args.render_scale or 1.0)
+  world = scaler.target(screen)
+  ice = IceProjector(ice_texture, world.get_size())
+  rng = random.Random(SEED)
+  stones = [Stone(SCREEN_W // 2 + rng.uniform(-150, 150), TARGET_Y + rng.uniform(-200, 200),
+                  RED if i % 2 else YELLOW) for i in range(7)]
+  current = Stone(SCREEN_W // 2, START_Y, RED)
+  frames = 60 if args.quick else 240
+
+  def draw_world(cam, drawn):
+    main.draw_stage_3d(world, cam, ice)
+    main.draw_stones(world, drawn, "3D", cam)
+    scaler.present(screen, world)
+
+  def ui():
+    main.draw_enhanced_ui(screen, 1, 2, 1, stones, current, YELLOW)
+
+  def aiming():
+    for f in range(frames):
+      draw_world(START_Y + 600, stones + [current])
+      ui(); main.draw_aim_guide(screen, current, 20 + f % 10, START_Y + 600)
+      pg.display.update()
+
+  def tracking():
+    for f in range(frames):
+      cam = START_Y + 600 - f * (START_Y - SWITCH_VIEW_LINE) / frames
+      current.pos.y = cam - 700
+      draw_world(cam, stones + [current])
+      ui(); pg.display.update()
+    current.pos.y = START_Y
+
+  def topdown():
+    for f in range(frames):
+      current.pos.y = TARGET_Y + 400 - f
+      main.draw_stage_topdown(screen, ice_texture)
+      main.draw_stones(screen, stones + [current], "TOPDOWN")
+      ui(); pg.display.update()
+    current.pos.y = START_Y
+
+  def topdown_dirty():
+    """ topdown と同じ場面を、動いたところだけ描き直して送る """
+    dirty = DirtyRects()
+    layer = main.get_layer("topdown", screen, main.build_topdown_layer, ice_texture)
+    for f in range(frames):
+      current.pos.y = TARGET_Y + 400 - f
+      dirty.restore(screen, layer)
+      dirty.add(main.draw_stones(screen, stones + [current], "TOPDOWN"))
+      dirty.add(main.draw_enhanced_ui(screen, 1, 2, 1, stones, current, YELLOW))
+      rects = dirty.flush(screen)
+      if rects is None: pg.display.update()
+      else: pg.display.update(rects)
+    current.pos.y = START_Y
+
+  def cutin():
+    for f in range(frames):
+      draw_world(START_Y + 500, stones)
+      ui(); main.draw_cutin(screen, "YELLOW TEAM", "投球数 2 / 8", YELLOW, f / frames)
+      pg.display.update()
+
+  for name, fn in (("aiming_3d", aiming), ("tracking_3d", tracking), ("topdown", topdown),
+                   ("topdown_dirty", topdown_dirty), ("cutin", cutin)):
+    fn()  # キャッシュを温める
+    results[f"render_{name}_fps"] = (best_rate(fn, frames, 3), "fps", True)
+
+SUITES = {"physics": bench_physics, "bot": bench_bot, "render": bench_render}
+
+def compare(results, baseline, tolerance):
+  """ baseline より tolerance 以上悪くなった項目を返す """
+  worse = []
+  print(f"\n{'benchmark':<28} {'baseline':>12} {'now':>12} {'change':>8}")
+  for name, r in results.items():
+    b = baseline.get("results", {}).get(name)
+    if b is None:
+      print(f"{name:<28} {'-':>12} {r['value']:>12.3f} {'':>8} (not in baseline; --save-baseline to add)")
+      continue
+    # 良くなる向きに揃えた比率
+    ratio = r["value"] / b["value"] if r["higher_is_better"] else b["value"] / r["value"]
+    flag = " <-- slower" if ratio < 1 - tolerance else ""
+    print(f"{name:<28} {b['value']:>12.3f} {r['value']:>12.3f} {ratio - 1:>+7.1%}{flag}")
+    if flag: worse.append(name)
+  return worse
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--quick", action="store_true", help="回数を減らす")
+  parser.add_argument("--render-scale", type=float, help="3D の描画解像度の倍率 (0.5-1.0)")
+  parser.add_argument("--only", default=",".join(SUITES), help="physics,bot,render から選ぶ")
+  parser.add_argument("--out", help="結果の JSON")
+  parser.add_argument("--save-baseline", help="結果を基準として保存する")
+  parser.add_argument("--baseline", help="比べる基準の JSON")
+  parser.add_argument("--tolerance", type=float, default=0.15)
+  args = parser.parse_args()
+
+  raw = {}
+  for name in args.only.split(","):
+    t = time.perf_counter()
+    SUITES[name](raw, args)
+    print(f"[{name}] {time.perf_counter() - t:.1f} s", file=sys.stderr)
+  results = {k: {"value": v, "unit": u, "higher_is_better": hib} for k, (v, u, hib) in raw.items()}
+  for k, r in results.items(): print(f"{k:<28} {r['value']:>12.3f} {r['unit']}")
+
+  doc = {"meta": {"python": platform.python_version(), "pygame": pg.version.ver,
+                  "numpy": np.__version__, "platform": platform.platform(),
+                  "cpus": os.cpu_count(), "seed": SEED, "quick": args.quick,
+                  "render_scale": args.render_scale or 1.0},
+         "results": results}
+  for path in (args.out, args.save_baseline):
+    if path:
+      with open(path, "w") as f: json.dump(doc, f, indent=2)
+  if args.baseline:
+    with open(args.baseline) as f: baseline = json.load(f)
+    # 描画の解像度が違うと fps は比べられない (--render-scale ができる前の基準は 100%)
+    base_scale = baseline.get("meta", {}).get("render_scale", 1.0)
+    if "render" in args.only.split(",") and base_scale != doc["meta"]["render_scale"]:
+      print(f"\nbaseline was measured at --render-scale {base_scale:g}, this run at "
+            f"{doc['meta']['render_scale']:g}; not comparing", file=sys.stderr)
+      sys.exit(2)
+    worse = compare(results, baseline, args.tolerance)
+    if worse:
+      print(f"\n{len(worse)} benchmark(s) slower than baseline by more than {args.tolerance:.0%}")
+      sys.exit(1)
+
+if __name__ == "__main__":
+  main()
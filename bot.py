@@ -0,0 +1,305 @@
+import concurrent.futures as cf
+import multiprocessing
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from pygame.math import Vector2
+
+from config import *
+from batch_physics import TEAM_RED, TEAM_YELLOW, simulate_shots, throw_stones
+from predictor import power_for_hit, power_for_target
+from simulation import Stone
+from transposition import TranspositionTable, canonical_key
+
+# --- ボット ---
+
+# 難易度ごとの投球のブレ (x, パワー)
+NOISES = {1: (80, 4.0), 2: (30, 1.5), 3: (2, 0.2)}
+# 難易度ごとの探索量 (候補ショット数, 候補ごとのブレの試行数)
+SEARCH_BUDGETS = {1: (12, 4), 2: (40, 8), 3: (120, 10)}
+# カットイン (120 フレーム = 2 秒) の間に必ず返す
+PLAN_TIME_LIMIT = 1.5
+# 探索の中止を確かめる間隔 (秒)
+STOP_POLL = 0.02
+# ハウス内の位置取りの重み (得点 1 点に対して)
+HOUSE_WEIGHT = 0.5
+
+ShotPlan = namedtuple("ShotPlan", "x power value evaluated")
+
+def opponent_of(team):
+  return RED if team == YELLOW else YELLOW
+
+def heuristic_shot(stones, difficulty, team=YELLOW):
+  """ 一番近いストーンが相手ならテイクアウト、それ以外はドロー (ブレなし) """
+  target = Vector2(SCREEN_W // 2, TARGET_Y)
+  valid = [s for s in stones if not s.out_of_play and s.pos.y < WORLD_H / 2]
+  valid.sort(key=lambda s: s.pos.distance_to(target))
+  if valid and difficulty >= 2 and valid[0].color == opponent_of(team):
+    t_obj = valid[0]
+    return t_obj.pos.x, power_for_hit(t_obj.pos.y, TAKEOUT_HIT_SPEED)
+  return target.x, power_for_target(TARGET_Y)
+
+def apply_execution_noise(x, power, difficulty, rng=random):
+  ax, ap = NOISES.get(difficulty, (30, 1.5))
+  x += rng.uniform(-ax, ax)
+  power += rng.uniform(-ap, ap)
+  return x, min(power, POWER_MAX)
+
+def calculate_bot_strategy(stones, difficulty, rng=random, team=YELLOW):
+  tx, power = heuristic_shot(stones, difficulty, team)
+  return apply_execution_noise(tx, power, difficulty, rng)
+
+# --- モンテカルロ探索 ---
+
+def encode_board(stones):
+  """ プロセス間で渡せる (x, y, チーム) のタプル列にする """
+  return [(s.pos.x, s.pos.y, TEAM_RED if s.color == RED else TEAM_YELLOW)
+          for s in stones if not s.out_of_play]
+
+def decode_board(board):
+  return [Stone(x, y, RED if t == TEAM_RED else YELLOW) for x, y, t in board]
+
+def evaluate_boards(phys, team, last_stone=False):
+  """ get_score の得失点 + ハウス中心への近さで盤面を評価する (boards,) """
+  scores = phys.scores()
+  value = (scores[:, team] - scores[:, 1 - team]).astype(np.float64)
+  if last_stone: return value
+  d = phys.pos - (SCREEN_W // 2, TARGET_Y)
+  dist = np.sqrt((d * d).sum(axis=-1))
+  valid = ~phys.out_of_play & (phys.pos[..., 1] < WORLD_H / 2)
+  near = np.clip(1 - dist / HOUSE_RADIUS, 0, 1) * valid
+  mine = (near * (phys.teams == team)).sum(axis=1)
+  theirs = (near * (phys.teams != team)).sum(axis=1)
+  return value + HOUSE_WEIGHT * (mine - theirs)
+
+def opponent_reply(phys, team, noise):
+  """ 相手がヒューリスティック (自分の一番近いストーンをテイクアウト、なければ
+  ボタンへドロー) で打つと仮定した次の1投 (xs, powers) を盤面ごとに返す """
+  d = phys.pos - (SCREEN_W // 2, TARGET_Y)
+  dist = np.sqrt((d * d).sum(axis=-1))
+  valid = ~phys.out_of_play & (phys.pos[..., 1] < WORLD_H / 2)
+  dist[~valid] = np.inf
+  rows = np.arange(phys.shape[0])
+  closest = dist.argmin(axis=1)
+  takeout = valid[rows, closest] & (phys.teams[rows, closest] == team)
+  target = phys.pos[rows, closest]
+  xs = np.where(takeout, target[:, 0], SCREEN_W // 2)
+  draw = power_for_target(TARGET_Y)
+  powers = np.array([power_for_hit(y, TAKEOUT_HIT_SPEED) if t else draw
+                     for y, t in zip(target[:, 1], takeout)])
+  return xs + noise[:, 0], np.minimum(powers + noise[:, 1], POWER_MAX)
+
+def _evaluate_chunk(board, team, xs, powers, noise, last_stone, generation=None, abort_at=None):
+  """ ワーカープロセスで候補ショットごとの期待値を計算する。
+  最後の1投でなければ相手の返しの1投まで読む。探索が取り消された (世代が変わった) か
+  abort_at (time.time()) を過ぎたら途中でやめて None を返す """
+  def stop():
+    if abort_at is not None and time.time() > abort_at: return True
+    return generation is not None and _search_generation is not None and \
+        _search_generation.value != generation
+  xs = np.asarray(xs)[:, None] + noise[None, :, 0]
+  powers = np.minimum(np.asarray(powers)[:, None] + noise[None, :, 1], POWER_MAX)
+  color = RED if team == TEAM_RED else YELLOW
+  phys = simulate_shots(decode_board(board), xs.ravel(), powers.ravel(), color, stop=stop)
+  if phys is not None and not last_stone:
+    # 相手のブレは自分のブレの並びをずらして使う
+    reply_noise = np.tile(np.roll(noise, 1, axis=0), (xs.shape[0], 1))
+    phys = throw_stones(phys, *opponent_reply(phys, team, reply_noise), 1 - team, stop=stop)
+  if phys is None: return None
+  return evaluate_boards(phys, team, last_stone).reshape(xs.shape).mean(axis=1)
+
+def generate_candidates(stones, team, count, rng):
+  """ テイクアウト・ドロー・ガードの候補 (x, power) を count 個作る """
+  cx = SCREEN_W // 2
+  cands = [heuristic_shot(stones, 3, team)]
+  center = Vector2(cx, TARGET_Y)
+  for s in stones:
+    if s.out_of_play or s.color == team: continue
+    if s.pos.distance_to(center) < HOUSE_RADIUS + STONE_RADIUS * 2:
+      for hit in (TAKEOUT_HIT_SPEED * 0.6, TAKEOUT_HIT_SPEED, TAKEOUT_HIT_SPEED * 1.4):
+        cands.append((s.pos.x, power_for_hit(s.pos.y, hit)))
+  while len(cands) < count:
+    x = cx + rng.uniform(-HOUSE_RADIUS, HOUSE_RADIUS)
+    if rng.random() < 0.75:
+      y = TARGET_Y + rng.uniform(-HOUSE_RADIUS, HOUSE_RADIUS)
+    else:
+      y = rng.uniform(TARGET_Y + HOUSE_RADIUS, SWITCH_VIEW_LINE)
+    cands.append((x, power_for_target(y)))
+  return [(x, min(p, POWER_MAX)) for x, p in cands[:count]]
+
+WORKERS = os.cpu_count() or 1
+_executor = None
+_cache = None
+# 探索の世代 (ワーカーと共有)。cancel_searches() で進めると、走っている候補の計算がやめる
+_search_generation = None
+
+def _init_worker(generation):
+  global _search_generation
+  _search_generation = generation
+
+def get_executor():
+  global _executor, _search_generation
+  if _executor is None:
+    _search_generation = multiprocessing.Value("q", 0, lock=False)
+    _executor = cf.ProcessPoolExecutor(max_workers=WORKERS, initializer=_init_worker,
+                                       initargs=(_search_generation,))
+  return _executor
+
+def cancel_searches():
+  """ 走っている探索の候補の計算をやめさせる (捨てた探索が次の探索の前に並ばないように) """
+  if _search_generation is not None: _search_generation.value += 1
+
+def warm_up():
+  """ ワーカープロセスを先に起動しておく (最初の探索で待たないように) """
+  ex = get_executor()
+  for _ in range(WORKERS): ex.submit(int)
+
+def shutdown():
+  global _executor
+  if _cache is not None: _cache.save()
+  if _executor is not None:
+    _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+
+def get_cache():
+  """ 対局をまたいで使う置換表 (BOT_CACHE_FILE があれば読み込む) """
+  global _cache
+  if _cache is None: _cache = TranspositionTable(BOT_CACHE_BYTES, BOT_CACHE_FILE)
+  return _cache
+
+def plan_shot(stones, difficulty, team=YELLOW, last_stone=False, seed=None,
+              time_limit=PLAN_TIME_LIMIT, executor=None, cache=None,
+              thrown_count=None, hammer_team=None, stop=None, budget=None):
+  """ 候補ショットを難易度の探索量だけ作り、投球のブレ込みでシミュレーションして
+  期待値が最も高いものを返す。time_limit を過ぎたら評価済みの候補から選ぶ。
+  cache と thrown_count を渡すと同じ (に丸められる) 盤面の結果を使い回す。
+  stop (threading.Event) が立ったら残りの候補を取り消してすぐ返る。
+  budget (候補数, ブレの試行数) で SEARCH_BUDGETS の探索量を差し替える """
+  key = None
+  if cache is not None and thrown_count is not None:
+    key, mirrored = canonical_key(stones, team, difficulty, thrown_count, hammer_team)
+  if key is not None:
+    hit = cache.get(key)
+    if hit is not None:
+      dx, power, value, evaluated = hit
+      return ShotPlan(SCREEN_W // 2 + (-dx if mirrored else dx), power, value, evaluated)
+  plan = _search(stones, difficulty, team, last_stone, seed, time_limit, executor, stop, budget)
+  if key is not None and plan.evaluated and not (stop and stop.is_set()):
+    dx = plan.x - SCREEN_W // 2
+    cache.put(key, -dx if mirrored else dx, plan.power, plan.value, plan.evaluated)
+  return plan
+
+def _search(stones, difficulty, team, last_stone, seed, time_limit, executor, stop=None,
+            budget=None):
+  start = time.perf_counter()
+  rng = random.Random(seed)
+  team_idx = TEAM_RED if team == RED else TEAM_YELLOW
+  count, samples = budget or SEARCH_BUDGETS.get(difficulty, SEARCH_BUDGETS[2])
+  cands = generate_candidates(stones, team, count, rng)
+  ax, ap = NOISES.get(difficulty, (30, 1.5))
+  # 全候補で同じブレを使うと比較のばらつきが減る
+  noise = np.array([(rng.uniform(-ax, ax), rng.uniform(-ap, ap)) for _ in range(samples)])
+  board = encode_board(stones)
+  ex = executor or get_executor()
+  generation = _search_generation.value if _search_generation is not None else None
+  # time_limit を過ぎたら、ワーカーで走っている候補も打ち切る
+  abort_at = time.time() + time_limit - (time.perf_counter() - start)
+  chunks = max(1, min(len(cands), WORKERS * 2))
+  futures = {}
+  for k in range(chunks):
+    part = cands[k::chunks]
+    if not part: continue
+    fut = ex.submit(_evaluate_chunk, board, team_idx, [c[0] for c in part],
+                    [c[1] for c in part], noise, last_stone, generation, abort_at)
+    futures[fut] = part
+  pending = set(futures)
+  while pending and not (stop and stop.is_set()):
+    remaining = time_limit - (time.perf_counter() - start)
+    if remaining <= 0: break
+    _, pending = cf.wait(pending, timeout=min(remaining, STOP_POLL) if stop else remaining)
+  for fut in pending: fut.cancel()
+  best = None; evaluated = 0
+  for fut in futures:
+    if not fut.done() or fut.cancelled() or fut.exception() or fut.result() is None: continue
+    for (x, power), value in zip(futures[fut], fut.result()):
+      evaluated += 1
+      if best is None or value > best.value: best = ShotPlan(x, power, float(value), 0)
+  if best is None:
+    x, power = heuristic_shot(stones, difficulty, team)
+    return ShotPlan(x, power, 0.0, 0)
+  return best._replace(evaluated=evaluated)
+
+def choose_shot(stones, difficulty, team=YELLOW, last_stone=False, rng=random, **kwargs):
+  """ 探索した狙いに難易度のブレを加えた実際の投球 (x, power) """
+  plan = plan_shot(stones, difficulty, team, last_stone, seed=rng.random(), **kwargs)
+  return apply_execution_noise(plan.x, plan.power, difficulty, rng)
+
+# --- 非同期の思考 ---
+
+# これを過ぎても探索が返らなければヒューリスティックで投げる
+THINK_DEADLINE = PLAN_TIME_LIMIT + 0.5
+
+class BotThinker:
+  """ 前の投球が止まった時点 (カットイン中) から次の1投を裏のスレッドで考える。
+  AIMING は poll() で結果を待つだけなので描画が止まらない """
+
+  def __init__(self, deadline=THINK_DEADLINE, verbose=True):
+    self.deadline = deadline
+    self.verbose = verbose
+    self._pool = cf.ThreadPoolExecutor(max_workers=1, thread_name_prefix="bot")
+    self.future = None
+    self.think_times = []
+
+  def start(self, stones, difficulty, team=YELLOW, last_stone=False, rng=random,
+            thrown_count=None, hammer_team=None):
+    """ 盤面のコピーを渡して考え始める。前の思考が残っていれば捨てる """
+    self.cancel()
+    stones = [s.copy() for s in stones]
+    self.args = (stones, difficulty, team, last_stone)
+    self.rng = rng
+    self.started = time.perf_counter()
+    self.stop = threading.Event()
+    self.future = self._pool.submit(self._think, stones, difficulty, team, last_stone,
+                                    rng.random(), thrown_count, hammer_team, self.stop)
+
+  def _think(self, stones, difficulty, team, last_stone, seed, thrown_count, hammer_team, stop):
+    plan = plan_shot(stones, difficulty, team, last_stone, seed=seed, cache=get_cache(),
+                     thrown_count=thrown_count, hammer_team=hammer_team, stop=stop)
+    return plan, time.perf_counter() - self.started
+
+  @property
+  def thinking(self):
+    return self.future is not None
+
+  def poll(self):
+    """ 結果が出ていれば難易度のブレを加えた (x, power)、まだなら None """
+    if self.future is None: return None
+    stones, difficulty, team, _ = self.args
+    if self.future.done() and not self.future.exception():
+      plan, elapsed = self.future.result()
+      cache = get_cache()
+      label = f"{plan.evaluated} shots, cache {cache.hits}/{cache.hits + cache.misses}"
+    elif self.future.done() or time.perf_counter() - self.started > self.deadline:
+      x, power = heuristic_shot(stones, difficulty, team)
+      plan, elapsed = ShotPlan(x, power, 0.0, 0), time.perf_counter() - self.started
+      label = "deadline, heuristic"
+    else:
+      return None
+    self.cancel()
+    self.think_times.append(elapsed)
+    if self.verbose: print(f"bot think {elapsed * 1000:.0f} ms ({label})")
+    return apply_execution_noise(plan.x, plan.power, difficulty, self.rng)
+
+  def cancel(self):
+    """ 思考を捨てる。走っている探索とワーカーの計算も止めて、次の1投の前に残さない """
+    if self.future is not None and not self.future.done():
+      self.future.cancel(); self.stop.set(); cancel_searches()
+    self.future = None
+
+  def shutdown(self):
+    self.cancel()
+    self._pool.shutdown(wait=False, cancel_futures=True)
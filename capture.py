@@ -0,0 +1,159 @@
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+import pygame as pg
+
+# --- プレイ画面の録画 ---
+#
+# ゲームのスレッドでは画面のピクセルを作り置きのバッファへコピーするだけにして、
+# 縮小と書き出しは別スレッドで行う (numpy と zlib は GIL を離すのでゲームを止めない)。
+# バッファが全部使用中 (書き出しが追いつかない) のときはその回の録画を飛ばして数える。
+# ゲームのフレームは待たせない。
+
+# 作り置きするバッファの数 (= 書き出し待ちの上限)
+CAPTURE_POOL = 8
+# PNG の圧縮レベル (速さ優先)
+PNG_LEVEL = 1
+
+def encode_png(rgb, level=PNG_LEVEL):
+  """ (高さ, 幅, 3) の uint8 を PNG のバイト列にする """
+  h, w, _ = rgb.shape
+  raw = np.empty((h, w * 3 + 1), np.uint8)
+  raw[:, 0] = 0  # 各行のフィルタなし
+  raw[:, 1:] = rgb.reshape(h, -1)
+
+  def chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+  return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0))
+          + chunk(b"IDAT", zlib.compress(raw.tobytes(), level)) + chunk(b"IEND", b""))
+
+def downscale(rgb, factor):
+  """ factor x factor のブロックの平均で縮める """
+  if factor == 1: return rgb
+  h, w, _ = rgb.shape
+  h, w = h // factor * factor, w // factor * factor
+  # ずらした間引きを足し合わせる (reshape して sum するより速い)
+  acc = np.zeros((h // factor, w // factor, 3), np.uint32)
+  for dy in range(factor):
+    for dx in range(factor): acc += rgb[dy:h:factor, dx:w:factor]
+  return (acc // (factor * factor)).astype(np.uint8)
+
+class Recorder:
+  """ fmt="png" は out_dir/frame_000000.png (書いた順の連番)、"raw" は out_dir/capture.rgb に
+  RGB24 を並べる。skip フレームに1回、1/downscale の大きさで残す。capture.json に大きさと
+  fps、書いた1枚ごとのゲームのフレーム番号、skip で飛ばした番号、書き出しが追いつかず
+  落とした番号を残す """
+
+  def __init__(self, out_dir, fmt="png", skip=1, downscale=1, fps=60, pool=CAPTURE_POOL):
+    if fmt not in ("png", "raw"): raise ValueError(f"unknown capture format: {fmt}")
+    self.out_dir, self.fmt = out_dir, fmt
+    self.skip, self.downscale, self.fps = max(1, skip), max(1, downscale), fps
+    self.pool = pool
+    self.paused = False
+    self.frame = 0
+    # 残したフレーム / 書き終えたフレーム / 書き出しが追いつかず飛ばしたフレーム
+    self.captured = self.written = self.dropped = 0
+    self.max_queued = 0
+    # ゲームのフレーム番号 (録画を始めてから。一時停止中は数えない)
+    self.frames, self.skipped, self.dropped_frames = [], [], []
+    self.copy_time = 0.0; self.encode_time = 0.0
+    self._buffers = None
+
+  def _start(self, screen):
+    if screen.get_bytesize() != 4: raise ValueError("capture needs a 32-bit display surface")
+    os.makedirs(self.out_dir, exist_ok=True)
+    w, h = screen.get_size()
+    self._shifts = screen.get_shifts()[:3]
+    self._buffers = [np.empty((w, h), np.uint32) for _ in range(self.pool)]
+    self._free = queue.Queue()
+    for i in range(self.pool): self._free.put(i)
+    self._work = queue.Queue()
+    self._size = (w // self.downscale, h // self.downscale)
+    self._raw = None
+    if self.fmt == "raw":
+      self._raw = open(os.path.join(self.out_dir, "capture.rgb"), "wb")
+      self._write_meta()  # 途中で落ちても raw を読めるように先に書いておく
+    self._thread = threading.Thread(target=self._write_loop, daemon=True)
+    self._thread.start()
+
+  def grab(self, screen):
+    """ 描き終えた画面を渡す。待たずにすぐ返る """
+    if self.paused: return
+    self.frame += 1
+    n = self.frame - 1
+    if n % self.skip:
+      self.skipped.append(n)
+      return
+    if self._buffers is None: self._start(screen)
+    try:
+      i = self._free.get_nowait()
+    except queue.Empty:
+      self.dropped += 1; self.dropped_frames.append(n)
+      return
+    t = time.perf_counter()
+    np.copyto(self._buffers[i], pg.surfarray.pixels2d(screen))
+    self.copy_time += time.perf_counter() - t
+    self._work.put((i, self.captured))
+    self.frames.append(n)
+    self.captured += 1
+    self.max_queued = max(self.max_queued, self._work.qsize())
+
+  def _write_loop(self):
+    rs, gs, bs = self._shifts
+    while True:
+      item = self._work.get()
+      if item is None: break
+      i, n = item
+      t = time.perf_counter()
+      px = self._buffers[i].T
+      rgb = np.empty(px.shape + (3,), np.uint8)
+      rgb[..., 0] = px >> rs; rgb[..., 1] = px >> gs; rgb[..., 2] = px >> bs
+      self._free.put(i)
+      rgb = downscale(rgb, self.downscale)
+      if self._raw:
+        self._raw.write(rgb.tobytes())
+      else:
+        with open(os.path.join(self.out_dir, f"frame_{n:06d}.png"), "wb") as f:
+          f.write(encode_png(rgb))
+      self.encode_time += time.perf_counter() - t
+      self.written += 1
+
+  def stats(self):
+    n = max(1, self.captured)
+    return {"captured": self.captured, "written": self.written, "dropped": self.dropped,
+            "max_queued": self.max_queued, "pool": self.pool,
+            "copy_ms": self.copy_time / n * 1000, "encode_ms": self.encode_time / max(1, self.written) * 1000}
+
+  def _write_meta(self):
+    meta = {"format": self.fmt, "width": self._size[0], "height": self._size[1],
+            "fps": self.fps / self.skip, "skip": self.skip, "downscale": self.downscale,
+            "frames": self.frames, "skipped": self.skipped, "dropped": self.dropped_frames}
+    if self.fmt == "raw": meta["pix_fmt"] = "rgb24"
+    with open(os.path.join(self.out_dir, "capture.json"), "w") as f: json.dump(meta, f)
+    return meta
+
+  def close(self):
+    """ 書き出し待ちを全部書いてから閉じ、結果を表示する """
+    if self._buffers is None: return
+    self._work.put(None)
+    self._thread.join()
+    if self._raw: self._raw.close()
+    meta = self._write_meta()
+    s = self.stats()
+    print(f"capture: {s['written']} frames to {self.out_dir}, {s['dropped']} dropped while the "
+          f"encoder was behind (queue max {s['max_queued']}/{s['pool']}), "
+          f"copy {s['copy_ms']:.2f} ms on the game thread, encode {s['encode_ms']:.1f} ms")
+    if self._raw:
+      src = (f"-f rawvideo -pix_fmt rgb24 -s {meta['width']}x{meta['height']} -r {meta['fps']:g} "
+             f"-i {os.path.join(self.out_dir, 'capture.rgb')}")
+    else:
+      src = f"-framerate {meta['fps']:g} -i {os.path.join(self.out_dir, 'frame_%06d.png')}"
+    # 落としたフレームの分だけ動画は短く (速く) なる。番号は capture.json の dropped
+    print(f"  ffmpeg {src} -pix_fmt yuv420p capture.mp4")
+    self._buffers = None
@@ -0,0 +1,71 @@
+# --- 定数設定 ---
+SCREEN_W, SCREEN_H = 600, 800
+WORLD_H = 2400
+
+# ストーン設定
+STONE_RADIUS = 38
+COURSE_WIDTH_HALF = 320
+PLAY_MIN_X = SCREEN_W // 2 - COURSE_WIDTH_HALF
+PLAY_MAX_X = SCREEN_W // 2 + COURSE_WIDTH_HALF
+
+# 摩擦・パワー設定
+FRICTION_NORMAL = 0.985
+FRICTION_SWEEP = 0.995
+POWER_MAX = 35
+STOP_SPEED = 0.05
+RESTITUTION = 1.9
+WALL_BOUNCE = -0.5
+# ゲームの1ステップ = 1/STEP_HZ 秒。描画のフレームレートとは別。
+# 速さ・摩擦・パワーの溜まり方・ボットの移動はどれもこの1ステップあたりの値
+STEP_HZ = 60
+# 物理の刻み (STEP_HZ の倍数)。1ステップを PHYSICS_HZ / STEP_HZ 回に分けて動かし、
+# そのたびに衝突を調べる。上げると衝突が細かくなるだけで、ゲームの速さは変わらない
+PHYSICS_HZ = 60
+PHYSICS_SUBSTEPS = max(1, PHYSICS_HZ // STEP_HZ)
+RENDER_FPS = 60
+# 1フレームで進める物理ステップの上限 (重いフレームが続いても追いつこうとしすぎない)
+MAX_PHYSICS_STEPS = 8
+# 早送り (F キー) の倍率
+FAST_FORWARD = 4
+# カットインの長さ、エンド終了から結果のカットインまでの間 (秒)
+CUTIN_SECONDS = 2.0
+RESULT_PAUSE = 1.0
+# カメラが目標との差を半分に縮めるまでの時間 (秒)。1/60 秒ごとに 1 割寄せるのと同じ
+CAMERA_HALF_LIFE = 0.11
+# タイトル・試合終了の静止画面でイベントを待つ最長時間 (ミリ秒)
+IDLE_WAIT_MS = 250
+# ボットのテイクアウトで狙うストーンに当たる速さ
+TAKEOUT_HIT_SPEED = 10
+# ボットの置換表のメモリ上限と保存先 (None なら保存しない)
+BOT_CACHE_BYTES = 8 * 1024 * 1024
+BOT_CACHE_FILE = None
+
+# --- 色の定義 ---
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+RED = (230, 60, 60)
+YELLOW = (230, 210, 40)
+BLUE = (50, 100, 200)
+GRANITE_GRAY = (180, 180, 190)
+SHADOW_COLOR = (0, 0, 0, 60)
+
+SKY_COLOR_TOP = (10, 15, 30)
+SKY_COLOR_BTM = (60, 80, 120)
+ICE_BASE = (240, 245, 255)
+FLOOR_COLOR = (200, 210, 220)
+FENCE_POST = (100, 80, 60)
+FENCE_ROPE = (80, 60, 40)
+
+MAX_ENDS = 2
+STONES_PER_END = 8
+STONES_PER_TEAM = 4
+
+START_Y = WORLD_H - 300
+TARGET_Y = 400
+SWITCH_VIEW_LINE = TARGET_Y + 500
+HOUSE_RADIUS = 180
+
+HORIZON_Y = 150
+VIEW_DIST = 5000
+CAMERA_HEIGHT = 500
+FOCAL_LENGTH = 500
@@ -0,0 +1,48 @@
+import pygame as pg
+
+# --- 差分描画 ---
+#
+# 背景が動かない画面 (上から見た図) で、前のフレームに描いた範囲だけを背景のレイヤーから
+# 描き戻し、今のフレームに描いた範囲と合わせて display.update に渡す。
+# invalidate() の後の最初のフレームは全体を描き直す。
+
+class DirtyRects:
+  def __init__(self):
+    self.valid = False
+    self.prev = []
+    self.rects = []
+    # 直近のフレームで画面に送った面積の割合 (重なりも数えるので目安。全体なら 1.0)
+    self.coverage = 1.0
+
+  def invalidate(self):
+    self.valid = False
+    self.rects = []
+
+  def restore(self, screen, background):
+    """ 前のフレームで描いた範囲を消す (無効なら全体を貼る) """
+    if self.valid:
+      for r in self.prev: screen.blit(background, r, r)
+    else:
+      screen.blit(background, (0, 0))
+    self.rects = []
+
+  def add(self, *rects):
+    """ 描いた範囲 (Rect、Rect のリスト、None) を覚える """
+    for r in rects:
+      if r is None: continue
+      if isinstance(r, pg.Rect): self.rects.append(r)
+      else: self.rects.extend(x for x in r if x is not None)
+
+  def flush(self, screen):
+    """ 画面に送る範囲のリスト。全体を送るときは None """
+    area = screen.get_rect()
+    if self.valid:
+      out = [r.clip(area) for r in self.prev + self.rects]
+      out = [r for r in out if r.w and r.h]
+      self.coverage = min(1.0, sum(r.w * r.h for r in out) / (area.w * area.h))
+    else:
+      out = None
+      self.coverage = 1.0
+    self.prev = self.rects
+    self.valid = True
+    return out
@@ -0,0 +1,61 @@
+from collections import OrderedDict
+
+import pygame as pg
+
+# --- フォントと文字描画のキャッシュ ---
+#
+# SysFont はフォント名の候補を毎回探しに行くので重い。(候補, サイズ, 太字) ごとに
+# 1度だけ作り、同じ文字列の render もサーフェスを使い回す。
+
+JP_FONT_NAMES = ("meiryo", "yugothic", "hiraginosans",
+                 "notosanscjkjp", "msgothic", "ipagothic")
+# 使い回す文字サーフェスの数 (スコアやエンド表示など、画面に出る文字列はそう多くない)
+TEXT_CACHE_SIZE = 256
+
+_fonts = {}
+
+def get_font(names, size, bold=False):
+  """ names は1つの名前か候補の並び。同じ指定なら同じ Font を返す """
+  if not isinstance(names, str): names = tuple(names)
+  key = (names, size, bold)
+  font = _fonts.get(key)
+  if font is None:
+    font = _fonts[key] = pg.font.SysFont(names, size, bold=bold)
+  return font
+
+def get_jp_font(size):
+  """ OSに合わせて日本語フォントを読み込む """
+  return get_font(JP_FONT_NAMES, size)
+
+class TextCache:
+  """ (フォント, 文字列, 色, アンチエイリアス) → サーフェス の LRU """
+
+  def __init__(self, max_size=TEXT_CACHE_SIZE):
+    self.max_size = max_size
+    self._surfs = OrderedDict()
+    self.hits = self.misses = 0
+
+  def render(self, font, text, antialias, color):
+    key = (font, text, tuple(color), antialias)
+    surf = self._surfs.get(key)
+    if surf is not None:
+      self._surfs.move_to_end(key)
+      self.hits += 1
+      return surf
+    self.misses += 1
+    surf = self._surfs[key] = font.render(text, antialias, color)
+    if len(self._surfs) > self.max_size: self._surfs.popitem(last=False)
+    return surf
+
+  def clear(self):
+    self._surfs.clear()
+
+  def stats(self):
+    return {"size": len(self._surfs), "hits": self.hits, "misses": self.misses}
+
+text_cache = TextCache()
+
+def render_text(font, text, antialias, color):
+  """ font.render(text, antialias, color) と同じだが、返したサーフェスは共有なので
+  書き換えないこと """
+  return text_cache.render(font, text, antialias, color)
@@ -0,0 +1,154 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pygame as pg
+
+from config import *
+
+# --- ペブル (氷の粒) のテクスチャ ---
+#
+# 粒を1つずつ pg.draw.circle で描く代わりに、乱数で位置・濃さ・大きさをまとめて作り、
+# 同じ色の粒の重なりは「透けて見える割合」の積 (1 - a1)(1 - a2)... で合成する
+# (描く順番に依らないので np.add.at で一度に足せる)。座標は幅・高さで折り返すので
+# 上下左右につなげて敷き詰められる。
+
+ICE_SEED = 0
+# 1 ピクセルあたりの粒の数 (600x800 に 30000 個)
+PEBBLE_DENSITY = 30000 / (600 * 800)
+PEBBLE_COLOR = (60, 80, 110)
+PEBBLE_ALPHA = (50, 120)
+# 半径 2 の粒の割合 (残りは半径 1)
+PEBBLE_BIG = 0.1
+ICE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "curling3d")
+
+# pg.draw.circle の半径 1, 2 と同じ形 (中心からの dx, dy)
+PEBBLE_STAMPS = {
+  1: ((-1, 0, -1, 0), (-1, -1, 0, 0)),
+  2: ((-1, 0, -2, -1, 0, 1, -2, -1, 0, 1, -1, 0), (-2, -2, -1, -1, -1, -1, 0, 0, 0, 0, 1, 1)),
+}
+
+def generate_ice_texture(width, height, seed=ICE_SEED):
+  """ 上下左右につながる SRCALPHA のペブルのテクスチャ。同じ seed なら同じ画像 """
+  rng = np.random.default_rng(seed)
+  n = int(width * height * PEBBLE_DENSITY)
+  xs = rng.integers(0, width, n)
+  ys = rng.integers(0, height, n)
+  alpha = rng.integers(PEBBLE_ALPHA[0], PEBBLE_ALPHA[1] + 1, n) / 255
+  big = rng.random(n) < PEBBLE_BIG
+  # 透けて見える割合の log を足し込む
+  clear = np.zeros((height, width))
+  for r, sel in ((1, ~big), (2, big)):
+    dx, dy = map(np.array, PEBBLE_STAMPS[r])
+    px = (xs[sel, None] + dx) % width
+    py = (ys[sel, None] + dy) % height
+    np.add.at(clear, (py, px), np.log1p(-alpha[sel, None]) + np.zeros(len(dx)))
+  rgba = np.empty((height, width, 4), np.uint8)
+  rgba[..., :3] = PEBBLE_COLOR
+  rgba[..., 3] = np.round((1 - np.exp(clear)) * 255)
+  return pg.image.frombytes(rgba.tobytes(), (width, height), "RGBA")
+
+def ice_texture_path(width, height, seed=ICE_SEED):
+  params = repr((seed, width, height, PEBBLE_DENSITY, PEBBLE_COLOR, PEBBLE_ALPHA, PEBBLE_BIG))
+  digest = hashlib.sha1(params.encode()).hexdigest()[:16]
+  return os.path.join(ICE_CACHE_DIR, f"ice_{width}x{height}_{digest}.rgba")
+
+def load_ice_texture(width, height, seed=ICE_SEED):
+  """ ディスクにあれば生の RGBA を読み、なければ作って保存する """
+  path = ice_texture_path(width, height, seed)
+  try:
+    with open(path, "rb") as f: data = f.read()
+    if len(data) == width * height * 4:
+      return pg.image.frombytes(data, (width, height), "RGBA")
+  except OSError:
+    pass
+  surf = generate_ice_texture(width, height, seed)
+  try:
+    os.makedirs(ICE_CACHE_DIR, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f: f.write(pg.image.tobytes(surf, "RGBA"))
+    os.replace(tmp, path)
+  except OSError:
+    pass
+  return surf
+
+# --- 遠近法の氷のテクスチャ ---
+#
+# 画面の各行はカメラからの距離 rel_y が決まっている (screen_y = HORIZON_Y +
+# CAMERA_HEIGHT * FOCAL_LENGTH / rel_y) ので、行ごとの縮尺と各列のテクスチャの u は
+# カメラに依らず最初に1度だけ計算できる。カメラが動いて変わるのは行ごとの v
+# (= camera_y - rel_y) だけなので、毎回の作り直しは1回の gather で済む。
+# コースの外と奥の端より先は透明な画素を指すので、マスク用のサーフェスはいらない。
+
+# テクスチャの v を丸める単位 (ワールド座標)。この単位で同じカメラ位置とみなす
+CAMERA_QUANT = 1
+# 作った画像を何枚覚えておくか (AIMING 中はほぼ1枚で足りる)
+CACHE_SIZE = 8
+# 縮尺がこれより小さい遠くの行は粒を薄くする (ちらつき防止)
+FADE_SCALE = 0.5
+# 氷の奥の端
+ICE_TOP_Y = TARGET_Y - 600
+
+def ice_bottom_y(camera_y):
+  """ 画面の一番下の行に映るワールドの y (氷の手前の端) """
+  return camera_y - FOCAL_LENGTH * CAMERA_HEIGHT / (SCREEN_H - HORIZON_Y)
+
+class IceProjector:
+  """ ice_texture (SRCALPHA) をコースの台形に遠近法で貼った画像を返す。
+  size が画面より小さいときは縮小した描画先に合わせて作る """
+
+  def __init__(self, ice_texture, size=(SCREEN_W, SCREEN_H)):
+    w, h = size
+    k = w / SCREEN_W
+    tw, th = ice_texture.get_size()
+    rgba = np.frombuffer(pg.image.tobytes(ice_texture, "RGBA"), np.uint8).reshape(th, tw, 4)
+    # 最後の行と列は透明 (コースの外・奥の端より先)
+    tex = np.zeros((th + 1, tw + 1), np.uint32)
+    tex[:th, :tw] = rgba.view(np.uint32)[..., 0]
+    self.tex, self.th, self.width = tex, th, w
+
+    self.top = int(HORIZON_Y * k) + 1
+    # 描画先のピクセルの中心を画面の座標に直して投影を逆にたどる
+    sy = (np.arange(self.top, h) + 0.5) / k
+    self.rel = FOCAL_LENGTH * CAMERA_HEIGHT / (sy - HORIZON_Y)
+    scale = FOCAL_LENGTH / self.rel
+    cx = SCREEN_W / 2
+    wx = cx + ((np.arange(w) + 0.5) / k - cx)[None, :] / scale[:, None]
+    u = ((wx - PLAY_MIN_X) * tw / (PLAY_MAX_X - PLAY_MIN_X)).astype(np.int64)
+    outside = (wx < PLAY_MIN_X) | (wx >= PLAY_MAX_X) | (self.rel > VIEW_DIST + 2000)[:, None]
+    self.u = np.where(outside, tw, u)
+    self.stride = tw + 1
+    fade = (np.clip(scale / FADE_SCALE, 0, 1) * 256).astype(np.uint32)
+    # 薄くするのは奥の行だけ (行は奥から手前の順)
+    self.fade_rows = int(np.count_nonzero(fade < 256))
+    self.fade = fade[:self.fade_rows, None]
+    self._cache = OrderedDict()
+
+  def _build(self, cam):
+    wy = cam - self.rel
+    rows = np.nonzero(wy >= ICE_TOP_Y)[0]
+    if len(rows) == 0: return None, 0
+    r0 = rows[0]
+    v = np.floor(wy[r0:]).astype(np.int64) % self.th
+    px = np.take(self.tex.ravel(), v[:, None] * self.stride + self.u[r0:])
+    if r0 < self.fade_rows:
+      far = px[:self.fade_rows - r0]
+      far[:] = (far & 0xFFFFFF) | (((far >> 24) * self.fade[r0:]) >> 8 << 24)
+    surf = pg.image.frombuffer(px, (self.width, len(v)), "RGBA").convert_alpha()
+    return surf, self.top + r0
+
+  def get(self, camera_y):
+    """ (サーフェス, 貼る y) を返す。氷が見えなければサーフェスは None """
+    cam = round(camera_y / CAMERA_QUANT) * CAMERA_QUANT
+    hit = self._cache.get(cam)
+    if hit is None:
+      hit = self._cache[cam] = self._build(cam)
+      if len(self._cache) > CACHE_SIZE: self._cache.popitem(last=False)
+    else:
+      self._cache.move_to_end(cam)
+    return hit
+
+  def draw(self, screen, camera_y):
+    surf, y = self.get(camera_y)
+    if surf is not None: screen.blit(surf, (0, y))
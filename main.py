@@ -1,309 +1,191 @@
 import pygame as pg
+import argparse
 import math
+import multiprocessing
 import random
-import sys
-import os
-
-# --- 定数設定 ---
-SCREEN_W, SCREEN_H = 600, 800
-WORLD_H = 2400
-
-# ストーン設定
-STONE_RADIUS = 38
-COURSE_WIDTH_HALF = 320
-PLAY_MIN_X = SCREEN_W // 2 - COURSE_WIDTH_HALF
-PLAY_MAX_X = SCREEN_W // 2 + COURSE_WIDTH_HALF
-
-# 摩擦・パワー設定
-FRICTION_NORMAL = 0.985
-FRICTION_SWEEP = 0.995
-POWER_MAX = 35
-
-# --- 色の定義 ---
-WHITE = (255, 255, 255)
-BLACK = (0, 0, 0)
-RED = (230, 60, 60)
-YELLOW = (230, 210, 40)
-BLUE = (50, 100, 200)
-GRANITE_GRAY = (180, 180, 190)
-SHADOW_COLOR = (0, 0, 0, 60)
-
-SKY_COLOR_TOP = (10, 15, 30)
-SKY_COLOR_BTM = (60, 80, 120)
-ICE_BASE = (240, 245, 255)
-FLOOR_COLOR = (200, 210, 220)
-FENCE_POST = (100, 80, 60)
-FENCE_ROPE = (80, 60, 40)
-
-MAX_ENDS = 2
-STONES_PER_END = 8
-STONES_PER_TEAM = 4
-
-START_Y = WORLD_H - 300
-TARGET_Y = 400
-SWITCH_VIEW_LINE = TARGET_Y + 500
-
-HORIZON_Y = 150
-VIEW_DIST = 5000
-CAMERA_HEIGHT = 500
-FOCAL_LENGTH = 500
-
-# --- フォントヘルパー関数 ---
-def get_jp_font(size):
-  """ OSに合わせて日本語フォントを読み込む """
-  font_names = ["meiryo", "yugothic", "hiraginosans",
-                "notosanscjkjp", "msgothic", "ipagothic"]
-  return pg.font.SysFont(font_names, size)
+import time
+
+import numpy as np
+
+from config import *
+from simulation import CurlingSimulation, FixedTimestep, clamp_throw_x, interpolate_positions
+from predictor import stop_position
+from ice import ICE_TOP_Y, IceProjector, ice_bottom_y, load_ice_texture
+import bot
+from replay import Replay, make_streams
+from fonts import get_font, get_jp_font, render_text, text_cache
+from particles import ParticleSystem
+from stone_sprites import StoneSprites
+from profiler import Profiler
+from scheduler import Scheduler, approach
+from dirty_rects import DirtyRects
+from render_scale import ResolutionScaler
+from capture import Recorder
 
 # --- クラス定義 ---
 
-class SweepParticle:
-  def __init__(self, x, y):
-    self.x = x
-    self.y = y
-    angle = random.uniform(0, math.pi * 2)
-    speed = random.uniform(2, 6)
-    self.vx = math.cos(angle) * speed
-    self.vy = math.sin(angle) * speed
-    self.life = random.randint(20, 40)
-    self.size = random.randint(3, 6)
-    self.color = (200, 230, 255)
-
-  def update(self):
-    self.x += self.vx
-    self.y += self.vy
-    self.life -= 1
-    self.size = max(0, self.size - 0.1)
-
-  def draw(self, screen):
-    if self.life > 0 and self.size > 0:
-      s = pg.Surface(
-          (int(self.size) * 2, int(self.size) * 2), pg.SRCALPHA)
-      alpha = int(255 * (self.life / 40))
-      pg.draw.circle(s, (*self.color, alpha),
-                     (int(self.size), int(self.size)), int(self.size))
-      screen.blit(s, (int(self.x) - self.size, int(self.y) - self.size))
-
-class Stone:
-  def __init__(self, x, y, color):
-    self.pos = pg.Vector2(x, y)
-    self.vel = pg.Vector2(0, 0)
-    self.color = color
-    self.radius = STONE_RADIUS
-    self.stopped = True
-    self.out_of_play = False
-    self.angle = 0
-
-  def update(self, friction):
-    if not self.stopped:
-      self.pos += self.vel
-      self.vel *= friction
-      speed = self.vel.length()
-      self.angle -= speed * 5
-      if speed < 0.05:
-        self.vel = pg.Vector2(0, 0)
-        self.stopped = True
-
-      if self.pos.x < PLAY_MIN_X + self.radius:
-        self.pos.x = PLAY_MIN_X + self.radius
-        self.vel.x *= -0.5
-      elif self.pos.x > PLAY_MAX_X - self.radius:
-        self.pos.x = PLAY_MAX_X - self.radius
-        self.vel.x *= -0.5
-
-      if self.pos.y < 0:
-        self.pos.y = 0
-        self.vel.y *= -0.5
-      if self.pos.y > WORLD_H:
-        self.stopped = True
-        self.out_of_play = True
-
-  def draw(self, screen, view_mode, camera_y=0):
-    if self.out_of_play: return
-
-    if view_mode == "3D":
-      scr_pos, scale = project_3d(self.pos, camera_y)
-    else:
-      scr_pos, scale = project_topdown(self.pos)
-
-    if scr_pos is None: return
-
-    draw_radius = max(2, int(self.radius * scale *
-                      (1.5 if view_mode == "3D" else 1.0)))
-    if draw_radius < 2: return
-
-    # 影の描画
-    if view_mode == "3D":
-      pg.draw.ellipse(screen, SHADOW_COLOR,
-                      (scr_pos[0] - draw_radius + 5, scr_pos[1] - int(draw_radius * 0.4) + 5,
-                       draw_radius * 2, int(draw_radius * 0.8)))
-    else:
-      pg.draw.circle(screen, SHADOW_COLOR,
-                     (scr_pos[0] + 3, scr_pos[1] + 3), draw_radius)
-
-    # 本体の描画
-    if view_mode == "3D":
-      rect_h = int(draw_radius * 0.7)
-      thickness = int(12 * scale)
-      pg.draw.ellipse(screen, (100, 100, 110),
-                      (scr_pos[0] - draw_radius, scr_pos[1] - rect_h // 2, draw_radius * 2, rect_h))
-      pg.draw.rect(screen, (130, 130, 140),
-                   (scr_pos[0] - draw_radius, scr_pos[1] - rect_h // 4 - thickness, draw_radius * 2, thickness))
-      top_y = scr_pos[1] - thickness
-      pg.draw.ellipse(screen, GRANITE_GRAY,
-                      (scr_pos[0] - draw_radius, top_y - rect_h // 2, draw_radius * 2, rect_h))
-      inner_r = int(draw_radius * 0.7)
-      inner_h = int(rect_h * 0.7)
-      pg.draw.ellipse(screen, self.color,
-                      (scr_pos[0] - inner_r, top_y - inner_h // 2, inner_r * 2, inner_h))
-      pg.draw.line(screen, (40, 40, 40), (scr_pos[0], top_y),
-                   (scr_pos[0], top_y - int(8 * scale)), int(4 * scale))
-
-      hl_w = int(draw_radius * 0.4)
-      hl_h = int(rect_h * 0.3)
-      hl_x = scr_pos[0] - int(draw_radius * 0.4)
-      hl_y = top_y - int(rect_h * 0.3)
-      s_hl = pg.Surface((hl_w * 2, hl_h * 2), pg.SRCALPHA)
-      pg.draw.ellipse(s_hl, (255, 255, 255, 120), (0, 0, hl_w, hl_h))
-      s_hl = pg.transform.rotate(s_hl, 20)
-      screen.blit(s_hl, (hl_x, hl_y))
-    else:
-      pg.draw.circle(screen, GRANITE_GRAY, scr_pos, draw_radius)
-      pg.draw.circle(screen, WHITE, scr_pos, draw_radius, 1)
-      inner_r = int(draw_radius * 0.7)
-      pg.draw.circle(screen, self.color, scr_pos, inner_r)
-      pg.draw.circle(screen, (255, 255, 255),
-                     (scr_pos[0] - int(inner_r * 0.3), scr_pos[1] - int(inner_r * 0.3)), int(inner_r * 0.2))
-      rad = math.radians(self.angle)
-      dx = inner_r * 0.8 * math.cos(rad)
-      dy = inner_r * 0.8 * math.sin(rad)
-      pg.draw.line(screen, (50, 50, 50),
-                   (scr_pos[0] - dx, scr_pos[1] - dy), (scr_pos[0] + dx, scr_pos[1] + dy), int(6 * scale))
+stone_sprites = StoneSprites()
+
+def draw_stones(screen, stones, view_mode, camera_y=0, positions=None):
+  """ 場にあるストーンを奥から順にまとめて投影して描き、描いた範囲のリストを返す。
+  positions (補間した位置) があればストーンの pos の代わりに使う。
+  3D は screen の幅に合わせて縮めて描く (縮小した描画先のとき) """
+  if positions is None: positions = [s.pos for s in stones]
+  drawn = sorted(((p.y, s, p) for s, p in zip(stones, positions) if not s.out_of_play),
+                 key=lambda t: t[0])
+  if not drawn: return []
+  stones = [s for _, s, _ in drawn]
+  world = [(p.x, p.y) for _, _, p in drawn]
+  k = 1.0
+  if view_mode == "3D":
+    k = screen.get_width() / SCREEN_W
+    pts, scales, vis = project_points(world, camera_y, k)
+  else:
+    pts, scales, vis = project_points_topdown(world)
+  return [stone_sprites.draw(screen, pos, stone.color, scale, view_mode, stone.angle, k)
+          for stone, pos, scale, ok in zip(stones, pts.tolist(), scales.tolist(), vis.tolist()) if ok]
 
 # --- 計算・描画ヘルパー ---
 
-def create_ice_texture(width, height):
-  surface = pg.Surface((width, height), pg.SRCALPHA)
-  for _ in range(30000):
-    x = random.randint(0, width)
-    y = random.randint(0, height)
-    alpha = random.randint(50, 120)
-    color = (60, 80, 110, alpha)
-    r = 1 if random.random() > 0.1 else 2
-    pg.draw.circle(surface, color, (x, y), r)
-  return surface
-
-def project_3d(world_pos, camera_y):
-  rel_y = camera_y - world_pos.y
-  if rel_y < 10: return None, 0
-  if rel_y > VIEW_DIST + 2000: return None, 0
-  scale = FOCAL_LENGTH / rel_y
-  screen_y = HORIZON_Y + CAMERA_HEIGHT * scale
+def project_points(world, camera_y, k=1.0):
+  """ (N, 2) のワールド座標をまとめて投影する。
+  (画面座標 (N, 2) の int, スケール (N,), 見えるか (N,)) を返す。
+  k は描画先の画面に対する倍率 (座標とスケールに掛ける) """
+  world = np.asarray(world, dtype=float).reshape(-1, 2)
+  rel_y = camera_y - world[:, 1]
+  visible = (rel_y >= 10) & (rel_y <= VIEW_DIST + 2000)
+  scale = np.where(visible, FOCAL_LENGTH / np.where(visible, rel_y, 1), 0)
   center_x = SCREEN_W / 2
-  offset_x = (world_pos.x - center_x) * scale
-  screen_x = center_x + offset_x
-  return (int(screen_x), int(screen_y)), scale
+  screen_x = center_x + (world[:, 0] - center_x) * scale
+  screen_y = HORIZON_Y + CAMERA_HEIGHT * scale
+  if k != 1.0: screen_x, screen_y, scale = screen_x * k, screen_y * k, scale * k
+  return np.stack([screen_x, screen_y], axis=1).astype(int), scale, visible
 
-def project_topdown(world_pos):
+def project_points_topdown(world):
+  world = np.asarray(world, dtype=float).reshape(-1, 2)
   scale = 0.8
-  screen_x = SCREEN_W // 2 + (world_pos.x - SCREEN_W // 2) * scale
-  screen_y = SCREEN_H // 2 + (world_pos.y - TARGET_Y) * scale
-  return (int(screen_x), int(screen_y)), scale
-
-def get_score(stones):
-  target = pg.Vector2(SCREEN_W // 2, TARGET_Y)
-  valid = [s for s in stones if not s.out_of_play and s.pos.y < WORLD_H / 2]
-  if not valid: return 0, 0
-  valid.sort(key=lambda s: s.pos.distance_to(target))
-  winner = valid[0].color
-  pts = 0
-  for s in valid:
-    if s.color == winner: pts += 1
-    else: break
-  return (pts, 0) if winner == RED else (0, pts)
-
-def calculate_bot_strategy(stones, difficulty):
-  target = pg.Vector2(SCREEN_W // 2, TARGET_Y)
-  valid = [s for s in stones if not s.out_of_play and s.pos.y < WORLD_H / 2]
-  valid.sort(key=lambda s: s.pos.distance_to(target))
-  tx = target.x
-  if valid and difficulty >= 2 and valid[0].color == RED:
-    t_obj = valid[0]
-    tx = t_obj.pos.x
-    dist = START_Y - t_obj.pos.y
-    power = dist * (1 - FRICTION_NORMAL) * 1.6
-  else:
-    dist = START_Y - TARGET_Y
-    power = dist * (1 - FRICTION_NORMAL) * 1.02
-  noises = {1: (80, 4.0), 2: (30, 1.5), 3: (2, 0.2)}
-  ax, ap = noises.get(difficulty, (30, 1.5))
-  tx += random.uniform(-ax, ax)
-  power += random.uniform(-ap, ap)
-  return tx, min(power, POWER_MAX)
-
-def draw_background_3d(screen):
-  for y in range(HORIZON_Y):
-    ratio = y / HORIZON_Y
+  screen_x = SCREEN_W // 2 + (world[:, 0] - SCREEN_W // 2) * scale
+  screen_y = SCREEN_H // 2 + (world[:, 1] - TARGET_Y) * scale
+  n = len(world)
+  return np.stack([screen_x, screen_y], axis=1).astype(int), np.full(n, scale), np.ones(n, bool)
+
+# --- ステージの静的な形 (ワールド座標) ---
+
+HOUSE_RINGS = [(BLUE, 180), (WHITE, 120), (RED, 60), (WHITE, 15)]
+STAGE_LINES = [TARGET_Y, SWITCH_VIEW_LINE, TARGET_Y - 300]
+FENCE_STEP = 300
+FENCE_YS = np.arange(ICE_TOP_Y, WORLD_H + 1000, FENCE_STEP)
+
+def _stage_points():
+  """ 氷の奥の角、ハウスの中心と各リングの端、ライン両端、フェンスの柱 (左右交互) """
+  cx = SCREEN_W // 2
+  pts = [(PLAY_MIN_X, ICE_TOP_Y), (PLAY_MAX_X, ICE_TOP_Y), (cx, TARGET_Y)]
+  pts += [(cx + r, TARGET_Y) for _, r in HOUSE_RINGS]
+  for wy in STAGE_LINES: pts += [(PLAY_MIN_X, wy), (PLAY_MAX_X, wy)]
+  for wy in FENCE_YS: pts += [(PLAY_MIN_X - 10, wy), (PLAY_MAX_X + 10, wy)]
+  return np.array(pts, dtype=float)
+
+STAGE_POINTS = _stage_points()
+_RING0 = 3
+_LINE0 = _RING0 + len(HOUSE_RINGS)
+_FENCE0 = _LINE0 + 2 * len(STAGE_LINES)
+
+# --- 静的なレイヤーのキャッシュ ---
+
+_layers = {}
+
+def _palette():
+  return (SKY_COLOR_TOP, SKY_COLOR_BTM, FLOOR_COLOR, ICE_BASE, BLUE, WHITE, RED, HORIZON_Y)
+
+def get_layer(name, screen, build, *deps):
+  """ パレット・deps が変わらないあいだは build の結果 (表示フォーマットに
+  変換済み) を使い回す。描画先の大きさごとに別々に持つ """
+  size = screen.get_size()
+  key = (_palette(), deps)
+  cached = _layers.get((name, size))
+  if cached is None or cached[0] != key:
+    cached = _layers[name, size] = (key, build(size, *deps).convert())
+  return cached[1]
+
+def build_sky_layer(size):
+  w, h = size
+  horizon = round(HORIZON_Y * h / SCREEN_H)
+  surf = pg.Surface(size)
+  for y in range(horizon):
+    ratio = y / horizon
     r = int(SKY_COLOR_TOP[0] * (1 - ratio) + SKY_COLOR_BTM[0] * ratio)
     g = int(SKY_COLOR_TOP[1] * (1 - ratio) + SKY_COLOR_BTM[1] * ratio)
     b = int(SKY_COLOR_TOP[2] * (1 - ratio) + SKY_COLOR_BTM[2] * ratio)
-    pg.draw.line(screen, (r, g, b), (0, y), (SCREEN_W, y))
-  pg.draw.rect(screen, FLOOR_COLOR, (0, HORIZON_Y,
-               SCREEN_W, SCREEN_H - HORIZON_Y))
+    pg.draw.line(surf, (r, g, b), (0, y), (w, y))
+  pg.draw.rect(surf, FLOOR_COLOR, (0, horizon, w, h - horizon))
+  return surf
+
+def build_topdown_layer(size, ice_texture):
+  w, h = size
+  surf = pg.Surface(size)
+  surf.fill(ICE_BASE)
+  surf.blit(ice_texture, (0, 0))
+  pg.draw.line(surf, (200, 200, 220), (w // 2, 0), (w // 2, h), 2)
+  center_scr = (w // 2, h // 2)
+  scale = 0.8
+  radii = [(BLUE, 180), (WHITE, 120), (RED, 60), (WHITE, 15)]
+  for col, r_world in radii:
+    pg.draw.circle(surf, col, center_scr, int(r_world * scale))
+    pg.draw.circle(surf, (200, 200, 200), center_scr, int(r_world * scale), 1)
 
-def draw_stage_3d(screen, camera_y, ice_texture):
+  s_overlay = pg.Surface(size, pg.SRCALPHA)
+  s_overlay.fill((255, 255, 255, 40))
+  surf.blit(s_overlay, (0, 0))
+  lines = [TARGET_Y, SWITCH_VIEW_LINE, TARGET_Y - 300]
+  for wy in lines:
+    sy = project_points_topdown((0, wy))[0][0, 1]
+    col = RED if wy != TARGET_Y else BLUE
+    pg.draw.line(surf, col, (0, sy), (w, sy), 3)
+  return surf
+
+def draw_background_3d(screen):
+  screen.blit(get_layer("sky", screen, build_sky_layer), (0, 0))
+
+def draw_stage_3d(screen, camera_y, ice):
+  """ ice は screen と同じ大きさの IceProjector """
   draw_background_3d(screen)
-  ice_top_y = TARGET_Y - 600
-  ice_btm_y = camera_y + 600
-  p_tl, _ = project_3d(pg.Vector2(PLAY_MIN_X, ice_top_y), camera_y)
-  p_tr, _ = project_3d(pg.Vector2(PLAY_MAX_X, ice_top_y), camera_y)
-  p_bl, _ = project_3d(pg.Vector2(PLAY_MIN_X, ice_btm_y), camera_y)
-  p_br, _ = project_3d(pg.Vector2(PLAY_MAX_X, ice_btm_y), camera_y)
+  ice_btm_y = ice_bottom_y(camera_y)
+  world = np.concatenate([STAGE_POINTS, [(PLAY_MIN_X, ice_btm_y), (PLAY_MAX_X, ice_btm_y)]])
+  pts, scales, vis = project_points(world, camera_y, screen.get_width() / SCREEN_W)
+  pts = pts.tolist(); scales = scales.tolist(); vis = vis.tolist()
 
   poly_ice = []
-  if p_tl and p_tr and p_bl and p_br:
-    poly_ice = [p_tl, p_tr, p_br, p_bl]
+  if vis[0] and vis[1] and vis[-2] and vis[-1]:
+    poly_ice = [pts[0], pts[1], pts[-1], pts[-2]]
     pg.draw.polygon(screen, ICE_BASE, poly_ice)
 
-  world_center = pg.Vector2(SCREEN_W // 2, TARGET_Y)
-  center_pos, _ = project_3d(world_center, camera_y)
-  if center_pos:
-    radii = [(BLUE, 180), (WHITE, 120), (RED, 60), (WHITE, 15)]
-    for col, r_world in radii:
-      edge_pos, _ = project_3d(pg.Vector2(
-          SCREEN_W // 2 + r_world, TARGET_Y), camera_y)
-      if edge_pos:
-        r_w = abs(edge_pos[0] - center_pos[0])
+  center_pos = pts[2]
+  if vis[2]:
+    for k, (col, _) in enumerate(HOUSE_RINGS):
+      if vis[_RING0 + k]:
+        r_w = abs(pts[_RING0 + k][0] - center_pos[0])
         r_h = int(r_w * 0.25)
         if r_w > 0:
           pg.draw.ellipse(
               screen, col, (center_pos[0] - r_w, center_pos[1] - r_h, r_w * 2, r_h * 2))
 
-  lines = [TARGET_Y, SWITCH_VIEW_LINE, TARGET_Y - 300]
-  for wy in lines:
-    p_l, s = project_3d(pg.Vector2(PLAY_MIN_X, wy), camera_y)
-    p_r, _ = project_3d(pg.Vector2(PLAY_MAX_X, wy), camera_y)
-    if p_l and p_r:
+  for k, wy in enumerate(STAGE_LINES):
+    i = _LINE0 + 2 * k
+    if vis[i] and vis[i + 1]:
       col = RED if wy != TARGET_Y else BLUE
-      pg.draw.line(screen, col, p_l, p_r, max(1, int(4 * s)))
-
-  if poly_ice:
-    pebble_layer = pg.Surface((SCREEN_W, SCREEN_H), pg.SRCALPHA)
-    pebble_layer.blit(ice_texture, (0, 0))
-    mask_surf = pg.Surface((SCREEN_W, SCREEN_H), pg.SRCALPHA)
-    mask_surf.fill((0, 0, 0, 0))
-    pg.draw.polygon(mask_surf, (255, 255, 255, 255), poly_ice)
-    pebble_layer.blit(mask_surf, (0, 0), special_flags=pg.BLEND_RGBA_MULT)
-    screen.blit(pebble_layer, (0, 0))
-
-  fence_step = 300
-  visible_start = max(int(ice_top_y), int(camera_y - VIEW_DIST))
+      pg.draw.line(screen, col, pts[i], pts[i + 1], max(1, int(4 * scales[i])))
+
+  if poly_ice: ice.draw(screen, camera_y)
+
+  visible_start = max(ICE_TOP_Y, camera_y - VIEW_DIST)
   visible_end = int(camera_y + 100)
   prev_l, prev_r = None, None
-  for wy in range(visible_start, visible_end, fence_step):
-    pl_base, s = project_3d(pg.Vector2(PLAY_MIN_X - 10, wy), camera_y)
-    pr_base, _ = project_3d(pg.Vector2(PLAY_MAX_X + 10, wy), camera_y)
-    if not (pl_base and pr_base): continue
+  for k, wy in enumerate(FENCE_YS.tolist()):
+    if wy >= visible_end: break
+    i = _FENCE0 + 2 * k
+    if wy < visible_start or not (vis[i] and vis[i + 1]): continue
+    s = scales[i]
+    pl_base, pr_base = pts[i], pts[i + 1]
     post_h = int(60 * s)
     pl_top = (pl_base[0], pl_base[1] - post_h)
     pr_top = (pr_base[0], pr_base[1] - post_h)
@@ -315,32 +197,14 @@ def draw_stage_3d(screen, camera_y, ice_texture):
     prev_l, prev_r = pl_top, pr_top
 
 def draw_stage_topdown(screen, ice_texture):
-  screen.fill(ICE_BASE)
-  screen.blit(ice_texture, (0, 0))
-  pg.draw.line(screen, (200, 200, 220), (SCREEN_W // 2, 0),
-               (SCREEN_W // 2, SCREEN_H), 2)
-  center_scr = (SCREEN_W // 2, SCREEN_H // 2)
-  scale = 0.8
-  radii = [(BLUE, 180), (WHITE, 120), (RED, 60), (WHITE, 15)]
-  for col, r_world in radii:
-    pg.draw.circle(screen, col, center_scr, int(r_world * scale))
-    pg.draw.circle(screen, (200, 200, 200),
-                   center_scr, int(r_world * scale), 1)
-
-  s_overlay = pg.Surface((SCREEN_W, SCREEN_H), pg.SRCALPHA)
-  s_overlay.fill((255, 255, 255, 40))
-  screen.blit(s_overlay, (0, 0))
-  lines = [TARGET_Y, SWITCH_VIEW_LINE, TARGET_Y - 300]
-  for wy in lines:
-    _, sy = project_topdown(pg.Vector2(0, wy))
-    col = RED if wy != TARGET_Y else BLUE
-    pg.draw.line(screen, col, (0, sy), (SCREEN_W, sy), 3)
+  screen.blit(get_layer("topdown", screen, build_topdown_layer, ice_texture), (0, 0))
 
 def draw_hammer_icon(screen, x, y, color):
   pg.draw.rect(screen, color, (x - 2, y - 5, 4, 24))
   pg.draw.rect(screen, color, (x - 10, y - 5, 20, 10))
 
 def draw_enhanced_ui(screen, score_r, score_y, end_num, stones, current_stone, hammer_team):
+  """ 得点板。描く範囲 (ハンマーと残りストーンを含む) を返す """
   cx, cy = SCREEN_W // 2, 50
   board_w, board_h = 360, 60
 
@@ -350,21 +214,21 @@ def draw_enhanced_ui(screen, score_r, score_y, end_num, stones, current_stone, h
 
   # フォントの使い分け
   font_jp = get_jp_font(30)
-  font_score = pg.font.SysFont("arial", 45, bold=True)
+  font_score = get_font("arial", 45, bold=True)
 
   # エンド表示
-  t_end = font_jp.render(
+  t_end = render_text(font_jp,
       f"第 {min(end_num, MAX_ENDS)} エンド", True, (220, 220, 220))
   screen.blit(t_end, t_end.get_rect(center=(cx, cy)))
 
   # 赤チームスコア
   pg.draw.circle(screen, RED, (cx - 130, cy), 24)
-  t_r = font_score.render(str(score_r), True, BLACK)
+  t_r = render_text(font_score, str(score_r), True, BLACK)
   screen.blit(t_r, t_r.get_rect(center=(cx - 130, cy)))
 
   # 黄チームスコア
   pg.draw.circle(screen, YELLOW, (cx + 130, cy), 24)
-  t_y = font_score.render(str(score_y), True, BLACK)
+  t_y = render_text(font_score, str(score_y), True, BLACK)
   screen.blit(t_y, t_y.get_rect(center=(cx + 130, cy)))
 
   # ハンマー（後攻）アイコン
@@ -394,19 +258,30 @@ def draw_enhanced_ui(screen, score_r, score_y, end_num, stones, current_stone, h
     pos_x = start_x_y - i * 25
     pg.draw.circle(screen, (220, 220, 60), (pos_x, stone_y), 7)
     pg.draw.circle(screen, (50, 50, 50), (pos_x, stone_y), 8, 1)
+  return pg.Rect(cx - 192, cy - board_h // 2 - 2, 384, board_h // 2 + 45 + 12)
 
 def draw_broom(screen, x, y, is_active):
   shake_x = 0
   if is_active: shake_x = int(math.sin(pg.time.get_ticks() * 0.05) * 15)
-  pg.draw.line(screen, (200, 200, 50), (x + shake_x, y),
-               (x + shake_x + 30, y - 80), 8)
+  handle = pg.draw.line(screen, (200, 200, 50), (x + shake_x, y),
+                        (x + shake_x + 30, y - 80), 8)
   head_rect = pg.Rect(x + shake_x - 25, y - 10, 50, 20)
   pg.draw.rect(screen, (50, 50, 50), head_rect, border_radius=5)
   pg.draw.rect(screen, (200, 50, 50),
                head_rect.inflate(-4, -4), border_radius=3)
+  return handle.union(head_rect)
+
+def draw_aim_guide(screen, stone, charge, camera_y):
+  """ 今のパワーで投げたときに止まる位置を氷上に表示する """
+  if charge <= 0: return
+  pts, scales, vis = project_points(stop_position(stone.pos.x, charge), camera_y)
+  if not vis[0]: return
+  pos, scale = pts[0], scales[0]
+  r_w = max(2, int(STONE_RADIUS * scale * 1.5))
+  r_h = max(1, int(r_w * 0.4))
+  pg.draw.ellipse(screen, WHITE, (pos[0] - r_w, pos[1] - r_h, r_w * 2, r_h * 2), 2)
 
 def draw_cutin(screen, text, sub_text, color, progress):
-  alpha = 255
   offset_x = 0
 
   if progress < 0.2:
@@ -438,248 +313,327 @@ def draw_cutin(screen, text, sub_text, color, progress):
   font_l = get_jp_font(70)
   font_s = get_jp_font(36)
 
-  txt_surf = font_l.render(text, True, text_color)
+  txt_surf = render_text(font_l, text, True, text_color)
   txt_rect = txt_surf.get_rect(
       center=(SCREEN_W // 2 + offset_x, SCREEN_H // 2 - 20))
 
   # 白文字の時だけ影をつける
   if text_color == WHITE:
-    txt_shadow = font_l.render(text, True, (0, 0, 0))
+    txt_shadow = render_text(font_l, text, True, (0, 0, 0))
     screen.blit(txt_shadow, (txt_rect.x + 4, txt_rect.y + 4))
 
   screen.blit(txt_surf, txt_rect)
 
   if sub_text:
-    sub_surf = font_s.render(sub_text, True, text_color)
+    sub_surf = render_text(font_s, sub_text, True, text_color)
     sub_rect = sub_surf.get_rect(
         center=(SCREEN_W // 2 + offset_x, SCREEN_H // 2 + 40))
     screen.blit(sub_surf, sub_rect)
 
-def main():
+# 描き直しが要らない (入力を待つだけの) 画面
+IDLE_STATES = ("START_MENU", "GAME_OVER")
+# 静止画面でも描き直すウィンドウのイベント
+REDRAW_EVENTS = (pg.WINDOWEXPOSED, pg.WINDOWRESTORED, pg.WINDOWSIZECHANGED, pg.VIDEOEXPOSE)
+
+def main(record=None, replay=None, profile=None, render_scale=None, capture=None):
+  """ record にリプレイを書き出す。replay を渡すとその試合を再生する。
+  profile を渡すとフレームのフェーズごとの時間を計測し、終了時に profile.csv / .json に書く。
+  render_scale を渡すと 3D の描画解像度をその倍率に固定する (渡さなければフレーム時間で調整)。
+  capture (Recorder) を渡すと描いたフレームを録画する (F9 で一時停止) """
   pg.init()
   screen = pg.display.set_mode((SCREEN_W, SCREEN_H))
   pg.display.set_caption("Curling 3D")
   clock = pg.time.Clock()
   pg.mouse.set_visible(False)
 
-  ice_texture = create_ice_texture(SCREEN_W, SCREEN_H)
+  ice_texture = load_ice_texture(SCREEN_W, SCREEN_H)
+  # 3D の世界は scaler の倍率の大きさに描く。氷の投影は大きさごとに作る
+  scaler = ResolutionScaler(fixed=render_scale)
+  ice_projectors = {}
+
+  def ice_for(target):
+    size = target.get_size()
+    if size not in ice_projectors: ice_projectors[size] = IceProjector(ice_texture, size)
+    return ice_projectors[size]
 
   difficulty = 2
   game_state = "START_MENU"
   view_mode = "3D"
 
-  stones = []
-  thrown_count = 0
-  turn = 0
-  current_end = 1
-  scores = [0, 0]
-  current_stone = None
+  # リプレイ: 再生するもの / 記録中のもの
+  playback = Replay.load(replay) if replay else None
+  recording = None
+  seed = playback.seed if playback else random.randrange(2 ** 32)
+  streams = make_streams(seed)
+
+  if playback:
+    sim = CurlingSimulation(playback.hammer_team, playback.max_ends, playback.stones_per_end)
+    difficulty = playback.difficulty; game_state = "RESET"
+    replay_throws = iter(playback.throws)
+  else:
+    sim = CurlingSimulation()
+  prof = Profiler(enabled=profile is not None)
+  sim.profiler = prof
+  prof_font = get_font(("consolas", "dejavusansmono", "couriernew"), 12)
+  replay_throw = None
+  replay_step = 0
   charge = 0
   charge_dir = 1
   is_charging = False
 
-  hammer_team = YELLOW
-
   camera_y = START_Y + 500
+  timestep = FixedTimestep()
+  frame_dt = 1 / RENDER_FPS
+  prev_positions = {}
   bot_target_x = 0
   bot_power = 0
   bot_stage = 0
+  thinker = bot.BotThinker()
+
+  sweep_particles = ParticleSystem(rng=streams.particles)
+  prof.watch("particles", sweep_particles.stats)
+  prof.watch("text", text_cache.stats)
 
-  sweep_particles = []
+  # カットイン・エンド終了の間・カメラの移動はゲームの時間で進める
+  sched = Scheduler()
 
   # --- カットイン用変数 ---
-  cutin_timer = 0
-  cutin_duration = 120
   cutin_text = ""
   cutin_sub = ""
   cutin_color = RED
-  cutin_next_state = ""
-  cutin_cam_start = 0
 
   def start_cutin(text, sub, color, next_state):
-    nonlocal game_state, cutin_timer, cutin_text, cutin_sub, cutin_color, cutin_next_state, cutin_cam_start
+    """ カメラを投球位置へ戻しながら CUTIN_SECONDS の間見せ、next_state へ進む """
+    nonlocal game_state, cutin_text, cutin_sub, cutin_color
     game_state = "CUT_IN"
-    cutin_timer = 0
     cutin_text = text
     cutin_sub = sub
     cutin_color = color
-    cutin_next_state = next_state
-    cutin_cam_start = camera_y
+    sched.tween("cutin", camera_y, START_Y + 500, CUTIN_SECONDS,
+                on_done=lambda: end_cutin(next_state))
+
+  def end_cutin(next_state):
+    nonlocal game_state, view_mode, charge, bot_stage
+    game_state = next_state
+    view_mode = "3D"
+    if game_state == "AIMING":
+      sim.spawn_stone()
+      charge = 0
+      bot_stage = 0
+
+  def finish_end():
+    """ エンドの得点を数え、次のエンドのカットインか試合終了へ """
+    nonlocal game_state
+    pts_r, pts_y = sim.finish_end()
+    if sim.is_over:
+      game_state = "GAME_OVER"
+      if recording and record:
+        recording.scores = tuple(sim.scores); recording.save(record)
+    else:
+      start_cutin(
+          "エンド終了", f"赤:{pts_r} - 黄:{pts_y}", BLUE, "RESET")
+
+  def start_bot_thinking():
+    """ カットインの間に次のボットの投球を考え始める """
+    if playback: return
+    thinker.start(sim.stones, difficulty, YELLOW,
+                  sim.thrown_count == sim.stones_per_end - 1, rng=streams.bot,
+                  thrown_count=sim.thrown_count, hammer_team=sim.hammer_team)
+
+  def release_stone(power):
+    """ 投げる。記録中ならリプレイに残す """
+    nonlocal game_state
+    sim.release(power); game_state = "MOVING"
+    if recording: recording.begin_throw(sim.team_color, sim.current_stone.pos.x, power)
+
+  # 静止画面: 最後に描いた画面の状態、描き直しを飛ばした回数、待った時間、静止画面を描いた時間
+  drawn_key = None
+  # 上から見た図は動いたところだけ描き直す
+  dirty = DirtyRects()
+  idle_skipped = 0; idle_wait = 0.0
+  static_draws = 0; static_draw_time = 0.0
 
   running = True
   while running:
+    prof.begin_frame()
+    frame_start = time.perf_counter()
     is_sweeping = False
     mx, my = pg.mouse.get_pos()
 
     for event in pg.event.get():
       if event.type == pg.QUIT: running = False
+      if event.type == pg.KEYDOWN and event.key == pg.K_F3: prof.toggle_overlay()
+      if event.type == pg.KEYDOWN and event.key == pg.K_F9 and capture:
+        capture.paused = not capture.paused
+      if event.type in REDRAW_EVENTS: drawn_key = None
+      if game_state == "GAME_OVER" and event.type == pg.KEYDOWN and event.key == pg.K_SPACE:
+        running = False
+      if event.type == pg.KEYDOWN and event.key == pg.K_RETURN and game_state in ("CUT_IN", "RESULT"):
+        sched.skip()
       if game_state == "START_MENU":
         if event.type == pg.KEYDOWN:
           if event.key == pg.K_1: difficulty = 1; game_state = "RESET"
           if event.key == pg.K_2: difficulty = 2; game_state = "RESET"
           if event.key == pg.K_3: difficulty = 3; game_state = "RESET"
-      if game_state == "AIMING" and turn == 0:
-        if current_stone:
+          if game_state == "RESET":
+            bot.warm_up()
+            recording = Replay(seed, difficulty, sim.hammer_team, sim.max_ends, sim.stones_per_end)
+      if game_state == "AIMING" and sim.turn == 0 and not playback:
+        if sim.current_stone:
           if event.type == pg.KEYDOWN and event.key == pg.K_SPACE:
             is_charging = True; charge = 0; charge_dir = 1
           if event.type == pg.KEYUP and event.key == pg.K_SPACE:
-            is_charging = False; current_stone.vel = pg.Vector2(
-                0, -charge); current_stone.stopped = False; game_state = "MOVING"; thrown_count += 1
+            is_charging = False; release_stone(charge)
 
-    if game_state == "MOVING" and turn == 0:
+    if game_state == "MOVING" and sim.turn == 0:
       if pg.mouse.get_pressed()[0]:
         is_sweeping = True
-        for _ in range(3):
-          shake = math.sin(pg.time.get_ticks() * 0.05) * 15
-          sweep_particles.append(SweepParticle(mx + shake, my))
-
-    # --- 状態遷移ロジック ---
-    if game_state == "RESET":
-      stones = []; thrown_count = 0; turn = 0
-      starter = RED if hammer_team == YELLOW else YELLOW
-      turn = 0 if starter == RED else 1
-      current_stone = None
-
-      col = RED if starter == RED else YELLOW
-      txt = "赤チーム スタート" if starter == RED else "黄チーム スタート"
-      start_cutin(f"第 {current_end} エンド", txt, col, "AIMING")
-
-    elif game_state == "CUT_IN":
-      cutin_timer += 1
-      target_cam = START_Y + 500
-      t = cutin_timer / cutin_duration
-      camera_y = cutin_cam_start * (1 - t) + target_cam * t
-
-      if cutin_timer >= cutin_duration:
-        game_state = cutin_next_state
+        shake = math.sin(pg.time.get_ticks() * 0.05) * 15
+        sweep_particles.emit(mx + shake, my, 3)
+
+    prof.lap("events")
+
+    # --- 状態遷移ロジック (物理と同じ固定ステップで進める) ---
+    fast = pg.key.get_pressed()[pg.K_f]
+    steps = timestep.advance(frame_dt, FAST_FORWARD if fast else 1)
+    for _ in range(steps):
+      sched.update(timestep.step_time)
+      if game_state == "RESET":
+        starter = sim.reset_end()
+
+        col = RED if starter == RED else YELLOW
+        txt = "赤チーム スタート" if starter == RED else "黄チーム スタート"
+        start_cutin(f"第 {sim.current_end} エンド", txt, col, "AIMING")
+        if sim.turn == 1: start_bot_thinking()
+
+      elif game_state == "CUT_IN":
+        camera_y = sched.value("cutin", camera_y)
+
+      elif game_state == "AIMING":
+        target_cam = START_Y + 600
+        camera_y = approach(camera_y, target_cam, CAMERA_HALF_LIFE, timestep.step_time)
         view_mode = "3D"
-        if game_state == "AIMING":
-          current_stone = Stone(
-              SCREEN_W // 2, START_Y, RED if turn == 0 else YELLOW)
-          charge = 0
-          bot_stage = 0
-
-    elif game_state == "AIMING":
-      target_cam = START_Y + 600
-      camera_y += (target_cam - camera_y) * 0.1
-      view_mode = "3D"
-      if current_stone:
-        if turn == 0:
-          keys = pg.key.get_pressed()
-          if keys[pg.K_LEFT]: current_stone.pos.x -= 4
-          if keys[pg.K_RIGHT]: current_stone.pos.x += 4
-          if is_charging:
-            charge += 0.5 * charge_dir
-            if charge >= POWER_MAX: charge, charge_dir = POWER_MAX, -1
-            elif charge <= 0: charge, charge_dir = 0, 1
-        else:
-          if bot_stage == 0: bot_target_x, bot_power = calculate_bot_strategy(
-              stones, difficulty); bot_stage = 1
-          elif bot_stage == 1:
-            dx = bot_target_x - current_stone.pos.x
-            if abs(dx) > 4: current_stone.pos.x += 4 if dx > 0 else -4
-            else: bot_stage = 2
-          elif bot_stage == 2:
-            charge += 0.5
-            if charge >= bot_power: current_stone.vel = pg.Vector2(
-                0, -charge); current_stone.stopped = False; game_state = "MOVING"; thrown_count += 1; bot_stage = 0; charge = 0
-        current_stone.pos.x = max(
-            PLAY_MIN_X + STONE_RADIUS, min(PLAY_MAX_X - STONE_RADIUS, current_stone.pos.x))
-
-    elif game_state == "MOVING":
-      if current_stone: current_stone.update(FRICTION_SWEEP if (
-          is_sweeping and turn == 0) else FRICTION_NORMAL)
-      for s in stones: s.update(FRICTION_NORMAL)
-
-      target_stone = current_stone if current_stone else (
-          stones[-1] if stones else None)
-      if target_stone and target_stone.pos.y < SWITCH_VIEW_LINE: view_mode = "TOPDOWN"
-      else:
-        view_mode = "3D"
-        stone_y = target_stone.pos.y if target_stone else START_Y
-        target_cam = max(
-            min(stone_y + 700, START_Y + 600), TARGET_Y + 700)
-        camera_y += (target_cam - camera_y) * 0.1
-
-      all_stones = stones[:]
-      if current_stone: all_stones.append(current_stone)
-      for i in range(len(all_stones)):
-        for j in range(i + 1, len(all_stones)):
-          s1 = all_stones[i]; s2 = all_stones[j]
-          if s1.out_of_play or s2.out_of_play: continue
-          dist_vec = s1.pos - s2.pos; dist = dist_vec.length()
-          if dist < STONE_RADIUS * 2:
-            if dist == 0: dist_vec = pg.Vector2(1, 0); dist = 1
-            overlap = (STONE_RADIUS * 2) - \
-                dist; normal = dist_vec.normalize()
-            s1.pos += normal * \
-                (overlap * 0.5); s2.pos -= normal * (overlap * 0.5)
-            rel_vel = s1.vel - \
-                s2.vel; vel_along_normal = rel_vel.dot(normal)
-            if vel_along_normal < 0:
-              impulse = normal * (-(1.9) * vel_along_normal / 2)
-              s1.vel += impulse; s2.vel -= impulse; s1.stopped = False; s2.stopped = False
-
-      if all(s.stopped for s in all_stones):
-        if current_stone: stones.append(current_stone)
-        current_stone = None
-
-        if thrown_count >= STONES_PER_END:
-          game_state = "RESULT"
-        else:
-          turn = 1 - turn
-          next_col = RED if turn == 0 else YELLOW
-          next_txt = "RED TEAM" if turn == 0 else "YELLOW TEAM"
-          sub_txt = f"投球数 {thrown_count + 1} / {STONES_PER_END}"
-          start_cutin(next_txt, sub_txt, next_col, "AIMING")
-
-    elif game_state == "RESULT":
-      view_mode = "TOPDOWN"
-      pg.time.delay(10)
-      if pg.time.get_ticks() % 100 == 0:
-        pts_r, pts_y = get_score(stones)
-        scores[0] += pts_r; scores[1] += pts_y
-        if pts_r > 0: hammer_team = YELLOW
-        elif pts_y > 0: hammer_team = RED
-
-        current_end += 1
-        if current_end > MAX_ENDS:
-          game_state = "GAME_OVER"
+        current_stone = sim.current_stone
+        if current_stone:
+          if sim.turn == 0 and not playback:
+            keys = pg.key.get_pressed()
+            if keys[pg.K_LEFT]: current_stone.pos.x -= 4
+            if keys[pg.K_RIGHT]: current_stone.pos.x += 4
+            if is_charging:
+              charge += 0.5 * charge_dir
+              if charge >= POWER_MAX: charge, charge_dir = POWER_MAX, -1
+              elif charge <= 0: charge, charge_dir = 0, 1
+          else:
+            if bot_stage == 0 and playback:
+              replay_throw = next(replay_throws, None); replay_step = 0
+              if replay_throw: bot_target_x, bot_power = replay_throw.x, replay_throw.power; bot_stage = 1
+            elif bot_stage == 0:
+              if not thinker.thinking: start_bot_thinking()
+              shot = thinker.poll()
+              if shot: bot_target_x, bot_power = shot; bot_stage = 1
+            elif bot_stage == 1:
+              dx = bot_target_x - current_stone.pos.x
+              if abs(dx) > 4: current_stone.pos.x += 4 if dx > 0 else -4
+              else:
+                # 再生は記録した位置ちょうどから投げる
+                if playback: current_stone.pos.x = bot_target_x
+                bot_stage = 2
+            elif bot_stage == 2:
+              charge += 0.5
+              if charge >= bot_power:
+                release_stone(bot_power if playback else charge); bot_stage = 0; charge = 0
+          current_stone.pos.x = clamp_throw_x(current_stone.pos.x)
+
+      elif game_state == "MOVING":
+        prev_positions = sim.snapshot()
+        sweep = is_sweeping and sim.turn == 0
+        if playback:
+          sweep = replay_step < len(replay_throw.sweeps) and replay_throw.sweeps[replay_step]
+          replay_step += 1
+        if recording: recording.record_step(sweep)
+        settled = sim.step(sweep)
+
+        target_stone = sim.current_stone if sim.current_stone else (
+            sim.stones[-1] if sim.stones else None)
+        if target_stone and target_stone.pos.y < SWITCH_VIEW_LINE: view_mode = "TOPDOWN"
         else:
-          start_cutin(
-              "エンド終了", f"赤:{pts_r} - 黄:{pts_y}", BLUE, "RESET")
-
-        pg.time.delay(1000)
+          view_mode = "3D"
+          stone_y = target_stone.pos.y if target_stone else START_Y
+          target_cam = max(
+              min(stone_y + 700, START_Y + 600), TARGET_Y + 700)
+          camera_y = approach(camera_y, target_cam, CAMERA_HALF_LIFE, timestep.step_time)
+
+        if settled:
+          prev_positions = {}
+          if sim.finish_throw():
+            game_state = "RESULT"
+            sched.after(RESULT_PAUSE, finish_end)
+          else:
+            next_col = sim.team_color
+            next_txt = "RED TEAM" if sim.turn == 0 else "YELLOW TEAM"
+            sub_txt = f"投球数 {sim.thrown_count + 1} / {sim.stones_per_end}"
+            start_cutin(next_txt, sub_txt, next_col, "AIMING")
+            if sim.turn == 1: start_bot_thinking()
+
+      elif game_state == "RESULT":
+        view_mode = "TOPDOWN"
+
+    prof.lap("update")
+
+    # --- 静止画面 ---
+    # 前に描いたときから何も変わっていなければ描かずに次のイベントを待つ
+    # (IDLE_WAIT_MS で一度起きる)。動いているものがある間は毎フレーム描く
+    idle = game_state in IDLE_STATES and not prof.overlay and not sweep_particles.live
+    idle_key = (game_state, view_mode, tuple(sim.scores)) if idle else None
+    if idle and idle_key == drawn_key and running:
+      t = time.perf_counter()
+      event = pg.event.wait(IDLE_WAIT_MS)
+      if event.type != pg.NOEVENT: pg.event.post(event)
+      idle_wait += time.perf_counter() - t; idle_skipped += 1
+      # 待った時間は物理に渡さない
+      clock.tick(); frame_dt = 1 / RENDER_FPS
+      prof.lap("idle")
+      prof.end_frame()
+      continue
+    draw_start = time.perf_counter()
 
     # --- 描画処理 ---
-    if view_mode == "3D":
-      draw_stage_3d(screen, camera_y, ice_texture)
-    else:
-      draw_stage_topdown(screen, ice_texture)
+    # 上から見た図で全体を覆うもの (カットイン・計測のグラフ) がなければ差分描画。
+    # 視点が切り替わった最初のフレームは全体を描く
+    use_dirty = view_mode == "TOPDOWN" and game_state in ("MOVING", "RESULT") and not prof.overlay
+    if not use_dirty: dirty.invalidate()
+    # タイトル画面は全体を塗りつぶすので下の画面は描かない
+    if game_state != "START_MENU":
+      world = scaler.target(screen) if view_mode == "3D" else screen
+      if view_mode == "3D":
+        draw_stage_3d(world, camera_y, ice_for(world))
+      elif use_dirty:
+        dirty.restore(screen, get_layer("topdown", screen, build_topdown_layer, ice_texture))
+      else:
+        draw_stage_topdown(screen, ice_texture)
+      prof.lap("stage")
 
-    draw_list = stones[:]
-    if current_stone: draw_list.append(current_stone)
-    draw_list.sort(key=lambda s: s.pos.y)
-    for s in draw_list:
-      s.draw(screen, view_mode, camera_y)
+      stones = sim.all_stones()
+      dirty.add(draw_stones(world, stones, view_mode, camera_y,
+                            interpolate_positions(stones, prev_positions, timestep.alpha)))
+      scaler.present(screen, world)
+      prof.lap("stones")
 
-    for p in sweep_particles[:]:
-      p.update()
-      p.draw(screen)
-      if p.life <= 0: sweep_particles.remove(p)
+      dirty.add(sweep_particles.step(screen))
+      prof.lap("particles")
 
     if game_state == "START_MENU":
       pg.mouse.set_visible(True)
       screen.fill((200, 210, 230))
 
       title_font = get_jp_font(100)
-      t = title_font.render("3D PRO", True, RED)
-      t2 = title_font.render("CURLINGER", True, BLUE)
+      t = render_text(title_font, "3D PRO", True, RED)
+      t2 = render_text(title_font, "CURLINGER", True, BLUE)
       screen.blit(t, (SCREEN_W // 2 - t.get_width() // 2, 200))
       screen.blit(t2, (SCREEN_W // 2 - t2.get_width() // 2, 280))
 
       menu_font = get_jp_font(36)
-      m = menu_font.render(
+      m = render_text(menu_font,
           "[1] easy   [2] normal   [3] hard", True, (50, 50, 70))
       screen.blit(m, (SCREEN_W // 2 - m.get_width() // 2, 500))
 
@@ -690,25 +644,25 @@ def main():
       screen.blit(s_overlay, (0, 0))
 
       res_font = get_jp_font(80)
-      res = "WIN!!" if scores[0] > scores[1] else "LOSE..."
-      col = RED if scores[0] > scores[1] else BLUE
-      t = res_font.render(res, True, col)
+      res = "WIN!!" if sim.scores[0] > sim.scores[1] else "LOSE..."
+      col = RED if sim.scores[0] > sim.scores[1] else BLUE
+      t = render_text(res_font, res, True, col)
       screen.blit(t, (SCREEN_W // 2 - t.get_width() // 2, 300))
 
       score_font = get_jp_font(40)
-      score_txt = score_font.render(
-          f"赤: {scores[0]}  -  黄: {scores[1]}", True, (50, 50, 50))
+      score_txt = render_text(score_font,
+          f"赤: {sim.scores[0]}  -  黄: {sim.scores[1]}", True, (50, 50, 50))
       screen.blit(score_txt, (SCREEN_W // 2 -
                   score_txt.get_width() // 2, 400))
-
-      if pg.key.get_pressed()[pg.K_SPACE]: running = False
     else:
-      draw_enhanced_ui(
-          screen, scores[0], scores[1], current_end, stones, current_stone, hammer_team)
-
-      if game_state == "AIMING" and current_stone and view_mode == "3D":
-        pos, scale = project_3d(current_stone.pos, camera_y)
-        if pos:
+      dirty.add(draw_enhanced_ui(
+          screen, sim.scores[0], sim.scores[1], sim.current_end, sim.stones, sim.current_stone, sim.hammer_team))
+
+      if game_state == "AIMING" and sim.current_stone and view_mode == "3D":
+        if sim.turn == 0: draw_aim_guide(screen, sim.current_stone, charge, camera_y)
+        pts, scales, vis = project_points(sim.current_stone.pos, camera_y)
+        if vis[0]:
+          pos, scale = pts[0].tolist(), float(scales[0])
           bar_w = int(100 * scale)
           bar_h = int(15 * scale)
           pg.draw.rect(
@@ -719,28 +673,73 @@ def main():
           pg.draw.rect(
               screen, color, (pos[0] - bar_w // 2 + 2, pos[1] + int(40 * scale) + 2, fill_w - 4, bar_h - 4))
 
+      prof.lap("ui")
       if game_state == "CUT_IN":
         draw_cutin(screen, cutin_text, cutin_sub,
-                   cutin_color, cutin_timer / cutin_duration)
+                   cutin_color, sched.progress("cutin"))
+      prof.lap("cutin")
 
-      show_brush = (game_state == "MOVING" and turn == 0) or (
-          game_state == "AIMING" and turn == 0)
+      show_brush = (game_state == "MOVING" and sim.turn == 0) or (
+          game_state == "AIMING" and sim.turn == 0)
       if show_brush and game_state != "CUT_IN":
-        draw_broom(screen, mx, my, is_sweeping)
+        dirty.add(draw_broom(screen, mx, my, is_sweeping))
         pg.mouse.set_visible(False)
       else:
         pg.mouse.set_visible(True)
 
       if is_sweeping and game_state == "MOVING":
         sweep_font = get_jp_font(80)
-        msg = sweep_font.render("SWEEP!!!", True, (255, 50, 50))
-        txt_shake = random.randint(-2, 2)
-        screen.blit(msg, (SCREEN_W // 2 - msg.get_width() //
-                    2 + txt_shake, SCREEN_H - 150 + txt_shake))
-
-    pg.display.update()
-    clock.tick(60)
+        msg = render_text(sweep_font, "SWEEP!!!", True, (255, 50, 50))
+        txt_shake = streams.ui.randint(-2, 2)
+        dirty.add(screen.blit(msg, (SCREEN_W // 2 - msg.get_width() //
+                              2 + txt_shake, SCREEN_H - 150 + txt_shake)))
+
+    prof.lap("ui")
+    prof.draw_overlay(screen, prof_font)
+    prof.lap("profiler")
+
+    rects = dirty.flush(screen) if use_dirty else None
+    if rects is None: pg.display.update()
+    else: pg.display.update(rects)
+    if capture: capture.grab(screen)
+    prof.lap("display")
+    if view_mode == "3D" and game_state != "START_MENU":
+      scaler.record((time.perf_counter() - frame_start) * 1000)
+    if idle:
+      drawn_key = idle_key
+      static_draws += 1; static_draw_time += time.perf_counter() - draw_start
+    frame_dt = clock.tick(RENDER_FPS) / 1000
+    prof.lap("idle")
+    prof.end_frame()
+  if profile: prof.dump(profile)
+  if capture: capture.close()
+  if idle_skipped:
+    # 待っていた間、前は RENDER_FPS で同じ画面を描き直していた
+    frames = int(idle_wait * RENDER_FPS)
+    saved = frames * static_draw_time / max(1, static_draws)
+    print(f"idle: waited {idle_wait:.1f} s in {idle_skipped} wakeups, "
+          f"skipped ~{frames} redraws (~{saved:.2f} s of CPU)")
+  thinker.shutdown()
+  bot.shutdown()
   pg.quit()
 
 if __name__ == "__main__":
-  main()
+  multiprocessing.freeze_support()
+  parser = argparse.ArgumentParser(description="3D curling")
+  parser.add_argument("--record", metavar="FILE", help="試合をリプレイとして保存する")
+  parser.add_argument("--replay", metavar="FILE", help="保存したリプレイを再生する")
+  parser.add_argument("--profile", metavar="PREFIX",
+                      help="フレームの計測を有効にし、終了時に PREFIX.csv / PREFIX.json に書く (F3 でグラフ)")
+  parser.add_argument("--render-scale", type=float, metavar="SCALE",
+                      help="3D の描画解像度を 0.5-1.0 の倍率に固定する (省略時はフレーム時間で自動)")
+  parser.add_argument("--capture", metavar="DIR", help="プレイ画面を DIR に録画する (F9 で一時停止)")
+  parser.add_argument("--capture-format", choices=("png", "raw"), default="png",
+                      help="png: 連番画像, raw: RGB24 の動画 (ffmpeg で変換)")
+  parser.add_argument("--capture-skip", type=int, default=1, metavar="N", help="N フレームに1回残す")
+  parser.add_argument("--capture-downscale", type=int, default=1, metavar="N", help="1/N の大きさで残す")
+  args = parser.parse_args()
+  capture = None
+  if args.capture:
+    capture = Recorder(args.capture, args.capture_format, args.capture_skip, args.capture_downscale,
+                       fps=RENDER_FPS)
+  main(args.record, args.replay, args.profile, args.render_scale, capture)
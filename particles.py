@@ -0,0 +1,93 @@
+import time
+
+import numpy as np
+import pygame as pg
+
+# --- スイープのパーティクル ---
+#
+# x, y, vx, vy, life, size を固定長の配列に持ち、新しい粒は先頭位置から書いて
+# 一周したら一番古い粒を上書きする (上限を超えない)。更新は配列演算でまとめて行い、
+# 描画は (半径, 濃さの段階) ごとに作っておいたスプライトを blits で一度に貼る。
+
+PARTICLE_CAP = 256
+PARTICLE_COLOR = (200, 230, 255)
+PARTICLE_LIFE = (20, 40)
+PARTICLE_SIZE = (3, 6)
+PARTICLE_SPEED = (2, 6)
+# 1 フレームで縮む半径
+PARTICLE_SHRINK = 0.1
+# 濃さ (alpha) を何段階に丸めるか
+ALPHA_LEVELS = 32
+
+class ParticleSystem:
+  def __init__(self, capacity=PARTICLE_CAP, rng=None):
+    self.capacity = capacity
+    self.rng = rng if rng is not None else np.random.default_rng()
+    self.x = np.zeros(capacity); self.y = np.zeros(capacity)
+    self.vx = np.zeros(capacity); self.vy = np.zeros(capacity)
+    self.life = np.zeros(capacity, np.int32)
+    self.size = np.zeros(capacity)
+    self.head = 0
+    self.live = 0
+    self.last_ms = 0.0
+    self.atlas = {(r, a): self._sprite(r, a)
+                  for r in range(1, PARTICLE_SIZE[1] + 1) for a in range(1, ALPHA_LEVELS + 1)}
+
+  @staticmethod
+  def _sprite(r, level):
+    s = pg.Surface((r * 2, r * 2), pg.SRCALPHA)
+    alpha = min(255, int(255 * level / ALPHA_LEVELS))
+    pg.draw.circle(s, (*PARTICLE_COLOR, alpha), (r, r), r)
+    return s
+
+  def emit(self, x, y, count=1):
+    """ (x, y) から count 個をランダムな向きに飛ばす """
+    idx = (self.head + np.arange(count)) % self.capacity
+    self.head = (self.head + count) % self.capacity
+    angle = self.rng.uniform(0, np.pi * 2, count)
+    speed = self.rng.uniform(*PARTICLE_SPEED, count)
+    self.x[idx] = x; self.y[idx] = y
+    self.vx[idx] = np.cos(angle) * speed
+    self.vy[idx] = np.sin(angle) * speed
+    self.life[idx] = self.rng.integers(PARTICLE_LIFE[0], PARTICLE_LIFE[1] + 1, count)
+    self.size[idx] = self.rng.integers(PARTICLE_SIZE[0], PARTICLE_SIZE[1] + 1, count)
+
+  def update(self):
+    alive = self.life > 0
+    self.x[alive] += self.vx[alive]
+    self.y[alive] += self.vy[alive]
+    self.life[alive] -= 1
+    self.size[alive] = np.maximum(0, self.size[alive] - PARTICLE_SHRINK)
+
+  def draw(self, screen):
+    """ 描いた粒全体を囲む Rect (なければ None) を返す """
+    r = self.size.astype(np.int32)
+    idx = np.nonzero((self.life > 0) & (r > 0))[0]
+    if len(idx) == 0: return None
+    r = r[idx]
+    level = np.clip(self.life[idx] * ALPHA_LEVELS // PARTICLE_LIFE[1], 1, ALPHA_LEVELS)
+    px = (self.x[idx].astype(np.int32) - self.size[idx]).astype(np.int32)
+    py = (self.y[idx].astype(np.int32) - self.size[idx]).astype(np.int32)
+    atlas = self.atlas
+    screen.blits([(atlas[k], p) for k, p in zip(zip(r.tolist(), level.tolist()),
+                                                 zip(px.tolist(), py.tolist()))],
+                 doreturn=False)
+    x0, y0 = int(px.min()), int(py.min())
+    return pg.Rect(x0, y0, int((px + r * 2).max()) - x0, int((py + r * 2).max()) - y0)
+
+  def step(self, screen):
+    """ 1 フレーム分動かして描く。live と last_ms (更新 + 描画の時間) を残し、
+    描いた範囲を返す """
+    t = time.perf_counter()
+    self.update()
+    rect = self.draw(screen)
+    self.live = int(np.count_nonzero(self.life > 0))
+    self.last_ms = (time.perf_counter() - t) * 1000
+    return rect
+
+  def clear(self):
+    self.life[:] = 0
+    self.live = 0
+
+  def stats(self):
+    return {"live": self.live, "capacity": self.capacity, "ms": self.last_ms}
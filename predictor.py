@@ -0,0 +1,72 @@
+import math
+
+from config import *
+from simulation import decay_distance, decay_time, frames_to_stop
+
+# --- 軌道の予測 (閉じた式) ---
+#
+# ストーンは毎フレーム vel *= f で減速するので、k フレーム後の速度は p * f^k、
+# 進んだ距離は p * (1 - f^k) / (1 - f)。速度は距離に対して一次式
+# v = p - d * (1 - f) で減るので、止まる位置・時刻・必要なパワーが O(1) で求まる。
+# 衝突は考えない。奥の壁 (y=0) に届いたときは WALL_BOUNCE で跳ね返って戻る分も数える。
+
+def effective_friction(sweep=0.0):
+  """ 全フレームのうち sweep の割合だけスイープしたときの平均的な摩擦 """
+  return FRICTION_NORMAL ** (1 - sweep) * FRICTION_SWEEP ** sweep
+
+def stop_time(power, sweep=0.0):
+  """ 止まるまでのフレーム数 """
+  if power <= 0: return 0
+  return frames_to_stop(power, effective_friction(sweep))
+
+def stop_distance(power, sweep=0.0):
+  """ 壁がないとしたときに止まるまで進む距離 """
+  if power <= 0: return 0.0
+  f = effective_friction(sweep)
+  return power * decay_distance(frames_to_stop(power, f), f)
+
+def stop_position(x, power, sweep=0.0, start_y=START_Y):
+  """ 投げたストーンが止まる (x, y)。奥の壁 (y=0) に届けば跳ね返って戻った位置 """
+  if stop_distance(power, sweep) <= start_y: return x, start_y - stop_distance(power, sweep)
+  f = effective_friction(sweep)
+  # 壁を越えたフレーム (Stone.update は進めて減速した後に y=0 へ戻して速度を反転する)
+  k = math.floor(decay_time(start_y / power, f)) + 1
+  if k >= frames_to_stop(power, f): return x, 0.0
+  back = -WALL_BOUNCE * power * f ** k
+  # 手前の端 (WORLD_H) まで戻れば場外
+  return x, min(float(WORLD_H), back * decay_distance(frames_to_stop(back, f), f))
+
+def speed_at_distance(power, dist, sweep=0.0):
+  """ dist 進んだ時点の速度。届かなければ 0 """
+  if dist > stop_distance(power, sweep): return 0.0
+  return power - dist * (1 - effective_friction(sweep))
+
+def time_to_reach(line_y, power, sweep=0.0, start_y=START_Y):
+  """ ストーンが line_y (SWITCH_VIEW_LINE, TARGET_Y など) を通過するまでのフレーム数。
+  届かなければ None """
+  dist = start_y - line_y
+  if dist <= 0: return 0.0
+  if dist > stop_distance(power, sweep): return None
+  return decay_time(dist / power, effective_friction(sweep))
+
+def power_for_distance(dist, sweep=0.0):
+  """ ちょうど dist 進んで止まるパワー (逆問題) """
+  if dist <= 0: return 0.0
+  f = effective_friction(sweep)
+  guess = dist * (1 - f) + STOP_SPEED
+  n = frames_to_stop(guess, f)
+  # 停止フレームは整数なので、近いフレーム数ごとに p = dist / g(n) を試す
+  for k in (n, n - 1, n + 1):
+    if k < 1: continue
+    p = dist / decay_distance(k, f)
+    if frames_to_stop(p, f) == k: return p
+  return guess
+
+def power_for_target(target_y, sweep=0.0, start_y=START_Y):
+  """ 壁に当てずに target_y で止まるパワー。壁より奥は壁際 (y=0) に丸める """
+  return power_for_distance(start_y - max(0.0, target_y), sweep)
+
+def power_for_hit(target_y, hit_speed, sweep=0.0, start_y=START_Y):
+  """ target_y に hit_speed で当たるパワー (テイクアウト用) """
+  dist = max(0.0, start_y - target_y - STONE_RADIUS * 2)
+  return hit_speed + dist * (1 - effective_friction(sweep))
@@ -0,0 +1,168 @@
+import csv
+import json
+import time
+
+import numpy as np
+import pygame as pg
+
+# --- フレームのフェーズごとの計測 ---
+#
+# lap(phase) は前の lap からの経過時間をそのフェーズに足す。add(phase, 秒) は
+# 別のフェーズの途中で測った時間 (物理の中の衝突判定など) を足し、次の lap から
+# 差し引く。1フレーム分を end_frame() でリングバッファの1行にする。
+# 無効なときは各メソッドが何もしない関数に差し替わるので、呼び出し1回分の
+# コストしかかからない。
+# watch(name, fn) で登録した fn() の値 (粒の数など) も end_frame() ごとに読み、
+# 最新と最大をグラフの上の表と dump() の JSON に出す。
+
+PHASES = ("events", "update", "collisions", "stage", "stones", "particles",
+          "ui", "cutin", "profiler", "display", "idle")
+# 何フレーム分を覚えておくか
+PROFILE_FRAMES = 600
+PERCENTILES = (50, 95, 99)
+# グラフの色 (フェーズの順)
+PHASE_COLORS = ((120, 120, 120), (230, 160, 40), (230, 90, 40), (60, 140, 230), (160, 100, 220),
+                (120, 200, 230), (90, 200, 90), (230, 210, 40), (200, 200, 200), (220, 80, 160),
+                (60, 60, 60))
+# グラフの縦軸の上限 (ミリ秒) と 60 FPS の線
+GRAPH_MAX_MS = 33.3
+BUDGET_MS = 1000 / 60
+GRAPH_W, GRAPH_H = 200, 100
+# 表の数字を作り直す間隔 (フレーム)
+STATS_EVERY = 30
+
+def _noop(*args):
+  pass
+
+def _fmt(v):
+  return f"{v:.2f}" if isinstance(v, float) else str(v)
+
+class Profiler:
+  def __init__(self, enabled=False, capacity=PROFILE_FRAMES):
+    self.capacity = capacity
+    self.index = {p: i for i, p in enumerate(PHASES)}
+    self.frames = np.zeros((capacity, len(PHASES)), np.float32)
+    self.count = 0
+    self.overlay = False
+    self._graph = None; self._drawn = 0
+    self._table = None; self._table_at = 0
+    self.sources = {}
+    self.counters = {}; self.peaks = {}
+    self.set_enabled(enabled)
+
+  def set_enabled(self, enabled):
+    self.enabled = enabled
+    for name in ("begin_frame", "lap", "add", "end_frame"):
+      if enabled: self.__dict__.pop(name, None)
+      else: setattr(self, name, _noop)
+    if enabled:
+      self._row = np.zeros(len(PHASES))
+      self._last = time.perf_counter()
+      self._nested = 0.0
+
+  def watch(self, name, fn):
+    """ fn() は {名前: 数} を返す。計測が有効なフレームごとに読む """
+    self.sources[name] = fn
+
+  def toggle_overlay(self):
+    """ グラフを出すときは計測も有効にする """
+    self.overlay = not self.overlay
+    if self.overlay and not self.enabled: self.set_enabled(True)
+
+  def begin_frame(self):
+    self._row[:] = 0
+    self._nested = 0.0
+    self._last = time.perf_counter()
+
+  def lap(self, phase):
+    now = time.perf_counter()
+    self._row[self.index[phase]] += now - self._last - self._nested
+    self._nested = 0.0
+    self._last = now
+
+  def add(self, phase, seconds):
+    self._row[self.index[phase]] += seconds
+    self._nested += seconds
+
+  def end_frame(self):
+    self.frames[self.count % self.capacity] = self._row * 1000
+    self.count += 1
+    for name, fn in self.sources.items():
+      values = self.counters[name] = fn()
+      peak = self.peaks.setdefault(name, {})
+      for k, v in values.items(): peak[k] = max(peak.get(k, v), v)
+
+  def history(self):
+    """ 古い順に並べた (フレーム数, フェーズ数) のミリ秒 """
+    n = min(self.count, self.capacity)
+    start = self.count % self.capacity if self.count > self.capacity else 0
+    return np.roll(self.frames, -start, axis=0)[:n]
+
+  def stats(self):
+    """ フェーズごと (と 1 フレーム合計) の平均と p50/p95/p99 (ミリ秒) """
+    h = self.history()
+    if len(h) == 0: return {}
+    cols = {p: h[:, i] for i, p in enumerate(PHASES)}
+    cols["frame"] = h.sum(axis=1)
+    out = {}
+    for name, v in cols.items():
+      pct = np.percentile(v, PERCENTILES)
+      out[name] = {"mean": float(v.mean()), **{f"p{q}": float(x) for q, x in zip(PERCENTILES, pct)}}
+    return out
+
+  def draw_overlay(self, screen, font):
+    """ 直近のフレームの積み上げグラフとフェーズごとの p50/p95/p99。
+    グラフは1列ずつ横にずらして足し、表は STATS_EVERY フレームごとに作り直す """
+    if not self.overlay: return
+    if self._graph is None:
+      self._graph = pg.Surface((GRAPH_W, GRAPH_H)); self._graph.fill((0, 0, 0))
+    g = self._graph
+    px_per_ms = GRAPH_H / GRAPH_MAX_MS
+    if self.count and self.count != self._drawn:
+      self._drawn = self.count
+      g.scroll(-1, 0)
+      x = GRAPH_W - 1
+      pg.draw.line(g, (0, 0, 0), (x, 0), (x, GRAPH_H))
+      y = GRAPH_H
+      for i, ms in enumerate(self.frames[(self.count - 1) % self.capacity]):
+        seg = min(int(ms * px_per_ms), y)
+        if seg <= 0: continue
+        pg.draw.line(g, PHASE_COLORS[i], (x, y - 1), (x, y - seg))
+        y -= seg
+      g.set_at((x, GRAPH_H - int(BUDGET_MS * px_per_ms)), (255, 255, 255))
+    if self._table is None or self.count - self._table_at >= STATS_EVERY:
+      self._table = self._render_table(font); self._table_at = self.count
+    x0, y0 = screen.get_width() - GRAPH_W - 10, screen.get_height() - GRAPH_H - 10
+    screen.blit(g, (x0, y0))
+    screen.blit(self._table, (screen.get_width() - self._table.get_width() - 10,
+                              y0 - self._table.get_height() - 4))
+
+  def _render_table(self, font):
+    stats = self.stats()
+    names = PHASES + ("frame",)
+    line_h = font.get_linesize()
+    extra = [font.render(f"{name:<10} " + " ".join(f"{k}={_fmt(v)}" for k, v in values.items()),
+                         True, (255, 255, 255)) for name, values in self.counters.items()]
+    surf = pg.Surface((max([GRAPH_W] + [e.get_width() for e in extra]),
+                       line_h * (len(names) + 1 + len(extra))))
+    surf.blit(font.render(f"{'ms':<10} {'p50':>5} {'p95':>5} {'p99':>5}", True, (255, 255, 255)), (0, 0))
+    for i, name in enumerate(names):
+      s = stats.get(name)
+      if s is None: continue
+      col = PHASE_COLORS[i] if i < len(PHASES) else (255, 255, 255)
+      txt = f"{name:<10} {s['p50']:5.2f} {s['p95']:5.2f} {s['p99']:5.2f}"
+      surf.blit(font.render(txt, True, col), (0, line_h * (i + 1)))
+    for i, e in enumerate(extra): surf.blit(e, (0, line_h * (len(names) + 1 + i)))
+    return surf
+
+  def dump(self, prefix):
+    """ prefix.csv (フレームごとの生データ) と prefix.json (統計) を書く """
+    h = self.history()
+    with open(prefix + ".csv", "w", newline="") as f:
+      writer = csv.writer(f)
+      writer.writerow(PHASES + ("frame",))
+      for row in h: writer.writerow([f"{v:.4f}" for v in row] + [f"{row.sum():.4f}"])
+    with open(prefix + ".json", "w") as f:
+      json.dump({"frames": len(h), "phases": self.stats(),
+                 "counters": {name: {"last": self.counters[name], "peak": self.peaks[name]}
+                              for name in self.counters}}, f, indent=2)
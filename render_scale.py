@@ -0,0 +1,77 @@
+from collections import deque
+
+import pygame as pg
+
+from config import *
+
+# --- 描画解像度の自動調整 ---
+#
+# 3D のステージとストーンを縮小したサーフェスに描いて smoothscale で画面に広げる。
+# 文字などの UI は広げた後に画面へそのまま描くのでぼやけない。
+# 倍率は段階に丸める (段階ごとにレイヤーや氷の投影を作り置きできる)。
+# 直近のフレーム時間が予算を超え続けたら1段下げ、十分余裕が続いたら1段上げる。
+# 上げ下げの基準を離し、変えた直後はしばらく様子を見るので倍率がちらつかない。
+# 100% のときは縮小サーフェスを使わず画面に直接描く (広げる手間もかからない)。
+# 下げても速くならなかった (広げる手間の方が大きい) ときは戻し、それより下げない。
+
+RENDER_SCALES = (0.5, 0.625, 0.75, 0.875, 1.0)
+# 1 フレームの予算 (ミリ秒) に対して、これを超えたら下げる / 1段上げた後の見込み
+# (ピクセル数に比例するとして) がこれを下回ったら上げる
+SCALE_DOWN_AT = 0.9
+SCALE_UP_AT = 0.6
+# 判断に使うフレーム数 (倍率を変えた後はこれだけ貯まるまで変えない)
+SCALE_WINDOW = 45
+
+class ResolutionScaler:
+  def __init__(self, fixed=None, budget_ms=1000 / RENDER_FPS, size=(SCREEN_W, SCREEN_H)):
+    """ fixed を渡すとその倍率 (一番近い段階) のまま変えない """
+    self.fixed = fixed
+    self.budget_ms = budget_ms
+    self.size = size
+    self.index = len(RENDER_SCALES) - 1
+    if fixed is not None:
+      self.index = min(range(len(RENDER_SCALES)), key=lambda i: abs(RENDER_SCALES[i] - fixed))
+    self.samples = deque(maxlen=SCALE_WINDOW)
+    self.changes = 0
+    # これより下の段階は使わない / 直前に下げたときの中央値
+    self.floor = 0
+    self._before_down = None
+    self._targets = {}
+
+  @property
+  def scale(self):
+    return RENDER_SCALES[self.index]
+
+  def target(self, screen):
+    """ 3D の世界を描くサーフェス。100% なら screen そのもの """
+    if self.index == len(RENDER_SCALES) - 1: return screen
+    size = (round(self.size[0] * self.scale), round(self.size[1] * self.scale))
+    surf = self._targets.get(size)
+    if surf is None: surf = self._targets[size] = pg.Surface(size).convert(screen)
+    return surf
+
+  def present(self, screen, target):
+    """ target に描いた世界を画面の大きさに広げて screen に描く """
+    if target is not screen: pg.transform.smoothscale(target, screen.get_size(), screen)
+
+  def record(self, frame_ms):
+    """ 描画の仕事にかかった時間 (待ちを除く) を渡す。倍率を変えたら True """
+    if self.fixed is not None: return False
+    self.samples.append(frame_ms)
+    if len(self.samples) < SCALE_WINDOW: return False
+    # ときどき出る重いフレームに振り回されないよう中央値で見る
+    ms = sorted(self.samples)[len(self.samples) // 2]
+    before, self._before_down = self._before_down, None
+    step = 0
+    if before is not None and ms >= before:
+      self.floor = self.index + 1; step = 1
+    elif ms > self.budget_ms * SCALE_DOWN_AT and self.index > self.floor:
+      step = -1; self._before_down = ms
+    elif self.index < len(RENDER_SCALES) - 1:
+      grow = (RENDER_SCALES[self.index + 1] / self.scale) ** 2
+      if ms * grow < self.budget_ms * SCALE_UP_AT: step = 1
+    if not step: return False
+    self.index += step
+    self.changes += 1
+    self.samples.clear()
+    return True
@@ -0,0 +1,140 @@
+""" 試合のリプレイ (シード・難易度・各投球の x, パワー, ステップごとのスイープ) の記録と再生
+
+  python replay.py FILE... [--check]
+"""
+import argparse
+import random
+import struct
+import sys
+import time
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+from config import *
+from simulation import CurlingSimulation
+
+# --- 乱数の系統 ---
+#
+# ボット・パーティクル・画面の揺れが別々の乱数を使うので、どれかが引く回数が
+# 変わっても他の系統の並びはずれない。すべて試合のシードから作る。
+
+Streams = namedtuple("Streams", "bot particles ui")
+
+def make_streams(seed):
+  return Streams(random.Random(seed * 3 + 0), np.random.default_rng(seed * 3 + 1),
+                 random.Random(seed * 3 + 2))
+
+# --- 記録 ---
+#
+# ファイルは MAGIC の後ろに zlib で圧縮した本体。本体はヘッダと投球の並び:
+#   ヘッダ  seed u64, 難易度 u8, ハンマー u8, エンド数 u8, 1エンドの投球数 u8,
+#           最終スコア 赤 u16 黄 u16, 投球数 u16
+#   投球    チーム u8, x f64, パワー f64, ステップ数 u32, スイープのビット列
+
+MAGIC = b"CRP1"
+_HEAD = struct.Struct("<QBBBBHHH")
+_THROW = struct.Struct("<BddI")
+
+Throw = namedtuple("Throw", "team x power sweeps")
+
+class Replay:
+  def __init__(self, seed, difficulty, hammer_team=YELLOW, max_ends=MAX_ENDS,
+               stones_per_end=STONES_PER_END):
+    self.seed = seed
+    self.difficulty = difficulty
+    self.hammer_team = hammer_team
+    self.max_ends = max_ends
+    self.stones_per_end = stones_per_end
+    self.throws = []
+    self.scores = (0, 0)
+
+  def begin_throw(self, team, x, power):
+    self.throws.append(Throw(team, x, power, []))
+
+  def record_step(self, sweeping):
+    self.throws[-1].sweeps.append(bool(sweeping))
+
+  def to_bytes(self):
+    body = [_HEAD.pack(self.seed, self.difficulty, int(self.hammer_team == RED), self.max_ends,
+                       self.stones_per_end, *self.scores, len(self.throws))]
+    for t in self.throws:
+      body.append(_THROW.pack(int(t.team == RED), t.x, t.power, len(t.sweeps)))
+      body.append(np.packbits(np.array(t.sweeps, bool)).tobytes())
+    return MAGIC + zlib.compress(b"".join(body), 9)
+
+  @classmethod
+  def from_bytes(cls, data):
+    if data[:4] != MAGIC: raise ValueError("not a replay file")
+    body = zlib.decompress(data[4:])
+    seed, difficulty, hammer_red, max_ends, per_end, sr, sy, n = _HEAD.unpack_from(body)
+    rep = cls(seed, difficulty, RED if hammer_red else YELLOW, max_ends, per_end)
+    rep.scores = (sr, sy)
+    off = _HEAD.size
+    for _ in range(n):
+      red, x, power, steps = _THROW.unpack_from(body, off); off += _THROW.size
+      nbytes = (steps + 7) // 8
+      bits = np.unpackbits(np.frombuffer(body, np.uint8, nbytes, off))[:steps]
+      off += nbytes
+      rep.throws.append(Throw(RED if red else YELLOW, x, power, bits.astype(bool).tolist()))
+    return rep
+
+  def save(self, path):
+    with open(path, "wb") as f: f.write(self.to_bytes())
+
+  @classmethod
+  def load(cls, path):
+    with open(path, "rb") as f: return cls.from_bytes(f.read())
+
+# --- 再生 ---
+
+def simulate(rep, **sim_kwargs):
+  """ 画面なしで最後まで再シミュレーションする。(sim, 食い違いのリスト) を返す。
+  食い違いは記録と止まるまでのステップ数・チーム・最終スコアが違ったところ """
+  sim = CurlingSimulation(rep.hammer_team, rep.max_ends, rep.stones_per_end, **sim_kwargs)
+  problems = []
+  throws = iter(enumerate(rep.throws))
+  while not sim.is_over:
+    sim.reset_end()
+    end_over = False
+    while not end_over:
+      k, t = next(throws, (None, None))
+      if t is None:
+        problems.append("replay ended mid-match"); return sim, problems
+      if t.team != sim.team_color: problems.append(f"throw {k}: team mismatch")
+      sim.spawn_stone(t.x)
+      sim.release(t.power)
+      steps = 0
+      while True:
+        sweep = t.sweeps[steps] if steps < len(t.sweeps) else False
+        steps += 1
+        if sim.step(sweep): break
+      if steps != len(t.sweeps):
+        problems.append(f"throw {k}: stopped after {steps} steps, recorded {len(t.sweeps)}")
+      end_over = sim.finish_throw()
+    sim.finish_end()
+  if tuple(sim.scores) != tuple(rep.scores):
+    problems.append(f"score {tuple(sim.scores)}, recorded {tuple(rep.scores)}")
+  return sim, problems
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("files", nargs="+")
+  parser.add_argument("--check", action="store_true", help="記録と結果が違えば終了コード 1")
+  args = parser.parse_args()
+
+  failed = 0
+  start = time.perf_counter()
+  for path in args.files:
+    rep = Replay.load(path)
+    sim, problems = simulate(rep)
+    status = "ok" if not problems else "MISMATCH"
+    print(f"{path}: {sim.scores[0]}-{sim.scores[1]} {len(rep.throws)} throws {status}")
+    for p in problems: print(f"  {p}")
+    failed += bool(problems)
+  print(f"{len(args.files)} replays in {time.perf_counter() - start:.2f} s, {failed} mismatched")
+  if args.check and failed: sys.exit(1)
+
+if __name__ == "__main__":
+  main()
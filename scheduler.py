@@ -0,0 +1,90 @@
+import heapq
+
+# --- 時間で進む遷移 ---
+#
+# 遅れて呼ぶ関数 (after) と名前をつけた値の補間 (tween) を、ゲームの時間 (秒) で進める。
+# update(dt) は待たずにすぐ返るので、遷移の途中でもイベント処理と描画は毎フレーム回る。
+# 固定ステップの中で呼べば物理と同じく決定的で、早送りはステップ数を増やすだけ。
+
+# 浮動小数の足し算の誤差で1ステップ遅れないように
+EPS = 1e-9
+
+def linear(t):
+  return t
+
+def smoothstep(t):
+  return t * t * (3 - 2 * t)
+
+def approach(value, target, half_life, dt):
+  """ target へ指数的に近づける。half_life 秒で差が半分になる """
+  return target + (value - target) * 0.5 ** (dt / half_life)
+
+class Tween:
+  __slots__ = ("start", "end", "duration", "elapsed", "ease", "on_done")
+
+  def __init__(self, start, end, duration, ease=linear, on_done=None):
+    self.start, self.end = start, end
+    self.duration = duration
+    self.elapsed = 0.0
+    self.ease = ease
+    self.on_done = on_done
+
+  @property
+  def progress(self):
+    return min(1.0, self.elapsed / self.duration) if self.duration > 0 else 1.0
+
+  @property
+  def value(self):
+    return self.start + (self.end - self.start) * self.ease(self.progress)
+
+class Scheduler:
+  def __init__(self):
+    self.time = 0.0
+    self._timers = []  # (時刻, 連番, 関数) のヒープ
+    self._seq = 0
+    self.tweens = {}
+
+  def after(self, delay, fn):
+    """ delay 秒後に fn() を呼ぶ。cancel に渡す番号を返す """
+    self._seq += 1
+    heapq.heappush(self._timers, (self.time + delay, self._seq, fn))
+    return self._seq
+
+  def cancel(self, handle):
+    self._timers = [t for t in self._timers if t[1] != handle]
+    heapq.heapify(self._timers)
+
+  def tween(self, name, start, end, duration, ease=linear, on_done=None):
+    """ 同じ名前の tween があれば置き換える。終わると on_done() を呼んで消える """
+    tw = self.tweens[name] = Tween(start, end, duration, ease, on_done)
+    return tw
+
+  def value(self, name, default=None):
+    tw = self.tweens.get(name)
+    return default if tw is None else tw.value
+
+  def progress(self, name, default=1.0):
+    tw = self.tweens.get(name)
+    return default if tw is None else tw.progress
+
+  @property
+  def busy(self):
+    return bool(self._timers or self.tweens)
+
+  def update(self, dt):
+    self.time += dt
+    for name, tw in list(self.tweens.items()):
+      tw.elapsed += dt
+      if tw.elapsed + EPS < tw.duration: continue
+      # on_done が同じ名前で次の tween を始めることがあるので先に外す
+      if self.tweens.get(name) is tw: del self.tweens[name]
+      if tw.on_done: tw.on_done()
+    while self._timers and self._timers[0][0] <= self.time + EPS:
+      heapq.heappop(self._timers)[2]()
+
+  def skip(self):
+    """ 今待っているものをすぐ終わらせる (画面なしで回すときや演出を飛ばすとき)。
+    その中で新しく始まったものは残る """
+    remaining = [tw.duration - tw.elapsed for tw in self.tweens.values()]
+    remaining += [t[0] - self.time for t in self._timers]
+    if remaining: self.update(max(0.0, max(remaining)))
@@ -0,0 +1,335 @@
+import heapq
+import math
+import os
+import time
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from pygame.math import Vector2
+
+from config import *
+
+# --- 物理演算 (ウィンドウ不要) ---
+
+class Stone:
+  def __init__(self, x, y, color):
+    self.pos = Vector2(x, y)
+    self.vel = Vector2(0, 0)
+    self.color = color
+    self.radius = STONE_RADIUS
+    self.stopped = True
+    self.out_of_play = False
+    self.angle = 0
+    # 止まっていても押し戻された直後は次の衝突判定に含める
+    self.awake = True
+
+  def update(self, friction, h=1):
+    """ h ステップ分動かす (h < 1 は物理の刻み)。減速は閉じた式で進めるので、
+    刻んでも壁や衝突がなければ1ステップ後の位置と速度は刻まないときと同じ """
+    if not self.stopped:
+      if h == 1:
+        self.pos += self.vel
+        self.vel *= friction
+      else:
+        self.pos += self.vel * decay_distance(h, friction)
+        self.vel *= friction ** h
+      speed = self.vel.length()
+      self.angle -= speed * 5 * h
+      if speed < STOP_SPEED:
+        self.vel = Vector2(0, 0)
+        self.stopped = True
+
+      if self.pos.x < PLAY_MIN_X + self.radius:
+        self.pos.x = PLAY_MIN_X + self.radius
+        self.vel.x *= WALL_BOUNCE
+      elif self.pos.x > PLAY_MAX_X - self.radius:
+        self.pos.x = PLAY_MAX_X - self.radius
+        self.vel.x *= WALL_BOUNCE
+
+      if self.pos.y < 0:
+        self.pos.y = 0
+        self.vel.y *= WALL_BOUNCE
+      if self.pos.y > WORLD_H:
+        self.stopped = True
+        self.out_of_play = True
+
+  def copy(self):
+    s = Stone(self.pos.x, self.pos.y, self.color)
+    s.vel = Vector2(self.vel)
+    s.stopped = self.stopped
+    s.out_of_play = self.out_of_play
+    s.angle = self.angle
+    s.awake = self.awake
+    return s
+
+def resolve_pair(s1, s2):
+  """ 1組のストーンを押し戻し、反発させる。押し戻したら True """
+  dist_vec = s1.pos - s2.pos; dist = dist_vec.length()
+  if dist >= STONE_RADIUS * 2: return False
+  if dist == 0: dist_vec = Vector2(1, 0); dist = 1
+  overlap = (STONE_RADIUS * 2) - dist
+  normal = dist_vec.normalize()
+  s1.pos += normal * (overlap * 0.5); s2.pos -= normal * (overlap * 0.5)
+  rel_vel = s1.vel - s2.vel; vel_along_normal = rel_vel.dot(normal)
+  if vel_along_normal < 0:
+    impulse = normal * (-RESTITUTION * vel_along_normal / 2)
+    s1.vel += impulse; s2.vel -= impulse; s1.stopped = False; s2.stopped = False
+  return True
+
+def resolve_collisions_all_pairs(all_stones):
+  """ 全組を総当たりで調べる参照実装 (ベンチマーク・検証用) """
+  for i in range(len(all_stones)):
+    for j in range(i + 1, len(all_stones)):
+      s1 = all_stones[i]; s2 = all_stones[j]
+      if s1.out_of_play or s2.out_of_play: continue
+      resolve_pair(s1, s2)
+
+GRID_CELL = STONE_RADIUS * 2
+
+def _cell(stone):
+  return int(stone.pos.x // GRID_CELL), int(stone.pos.y // GRID_CELL)
+
+def resolve_collisions(all_stones):
+  """ 一様グリッドで近傍だけを調べる衝突処理。
+  動いている (または押し戻された直後の) ストーンとその近傍の組だけを
+  総当たりと同じ (i, j) 順で処理する。止まって離れたストーンは調べない """
+  active = [i for i, s in enumerate(all_stones)
+            if not s.out_of_play and (s.awake or not s.stopped)]
+  if not active: return
+  grid = {}; cells = {}
+  for i, s in enumerate(all_stones):
+    if s.out_of_play: continue
+    cells[i] = c = _cell(s)
+    grid.setdefault(c, []).append(i)
+
+  def neighbours(i):
+    cx, cy = cells[i]
+    for gx in (cx - 1, cx, cx + 1):
+      for gy in (cy - 1, cy, cy + 1):
+        yield from grid.get((gx, gy), ())
+
+  pairs = set()
+  for i in active:
+    all_stones[i].awake = False
+    for j in neighbours(i):
+      if i != j: pairs.add((i, j) if i < j else (j, i))
+  heap = list(pairs); heapq.heapify(heap)
+  while heap:
+    pair = heapq.heappop(heap)
+    s1 = all_stones[pair[0]]; s2 = all_stones[pair[1]]
+    if s1.out_of_play or s2.out_of_play: continue
+    if not resolve_pair(s1, s2): continue
+    s1.awake = s2.awake = True
+    # 押し戻したストーンはセルを更新し、総当たりならこの後に調べる組を追加する
+    for k in pair:
+      c = _cell(all_stones[k])
+      if c != cells[k]:
+        grid[cells[k]].remove(k); grid.setdefault(c, []).append(k); cells[k] = c
+      for m in neighbours(k):
+        p = (k, m) if k < m else (m, k)
+        if m != k and p > pair and p not in pairs:
+          pairs.add(p); heapq.heappush(heap, p)
+
+# --- 減速の閉じた式 ---
+#
+# 1フレームごとの速度減衰 vel *= f を連続時間に延ばすと、t フレーム後の変位は
+# vel * (1 - f^t) / (1 - f) になる (軌道の予測が使う)。
+
+def decay_distance(t, friction):
+  """ 速度 1 のストーンが t フレームで進む距離 """
+  return (1 - friction ** t) / (1 - friction)
+
+def decay_time(u, friction):
+  """ decay_distance の逆関数。進めない距離なら inf """
+  k = 1 - u * (1 - friction)
+  return math.log(k) / math.log(friction) if k > 0 else math.inf
+
+def frames_to_stop(speed, friction):
+  """ update() を繰り返したとき何フレーム目で止まるか """
+  if speed * friction < STOP_SPEED: return 1
+  return math.ceil(math.log(STOP_SPEED / speed) / math.log(friction))
+
+def get_score(stones):
+  target = Vector2(SCREEN_W // 2, TARGET_Y)
+  valid = [s for s in stones if not s.out_of_play and s.pos.y < WORLD_H / 2]
+  if not valid: return 0, 0
+  valid.sort(key=lambda s: s.pos.distance_to(target))
+  winner = valid[0].color
+  pts = 0
+  for s in valid:
+    if s.color == winner: pts += 1
+    else: break
+  return (pts, 0) if winner == RED else (0, pts)
+
+def clamp_throw_x(x):
+  return max(PLAY_MIN_X + STONE_RADIUS, min(PLAY_MAX_X - STONE_RADIUS, x))
+
+def sweep_at(sweep, step):
+  """ スイープ予定 (None / bool / 列 / 関数) から step フレーム目の有無を返す """
+  if sweep is None or isinstance(sweep, bool): return bool(sweep)
+  if callable(sweep): return bool(sweep(step))
+  return step < len(sweep) and bool(sweep[step])
+
+# --- 固定タイムステップ ---
+
+class FixedTimestep:
+  """ 描画フレームの経過時間を貯めて、固定長の物理ステップの回数に換える。
+  物理は常に同じ1ステップずつ進むので、描画のフレームレートが違っても
+  同じ入力なら同じ結果になる """
+
+  def __init__(self, rate=STEP_HZ, max_steps=MAX_PHYSICS_STEPS):
+    self.step_time = 1 / rate
+    self.max_steps = max_steps
+    self.acc = 0.0
+
+  def advance(self, dt, speed=1):
+    """ dt 秒経ったときに進める物理ステップ数。speed 倍で早送りする """
+    self.acc += dt * speed
+    steps = int(self.acc / self.step_time)
+    limit = self.max_steps * speed
+    if steps > limit:
+      # 追いつけない分は捨てる (スローモーションにはなるが固まらない)
+      steps = limit; self.acc = 0.0
+    else:
+      self.acc -= steps * self.step_time
+    return steps
+
+  @property
+  def alpha(self):
+    """ 最後の物理ステップから次のステップまでの割合 (描画の補間用) """
+    return min(1.0, self.acc / self.step_time)
+
+def interpolate_positions(stones, prev, alpha):
+  """ 直前のステップの位置 prev (id → Vector2) と今の位置の間を alpha で補間する """
+  out = []
+  for s in stones:
+    p = prev.get(id(s))
+    out.append(s.pos if p is None else p.lerp(s.pos, alpha))
+  return out
+
+# --- 試合進行 ---
+
+class CurlingSimulation:
+  """ 画面・フレーム制限なしで試合を進める。ゲーム本体はこれを描画するだけ """
+
+  def __init__(self, hammer_team=YELLOW, max_ends=MAX_ENDS, stones_per_end=STONES_PER_END,
+               substeps=PHYSICS_SUBSTEPS):
+    """ substeps は1ステップを何回に刻んで物理を進めるか """
+    self.substeps = substeps
+    self.max_ends = max_ends
+    self.stones_per_end = stones_per_end
+    self.stones = []
+    self.current_stone = None
+    self.thrown_count = 0
+    self.turn = 0
+    self.current_end = 1
+    self.scores = [0, 0]
+    self.hammer_team = hammer_team
+    self.frames = 0
+    # 衝突判定の時間を測る Profiler (main が入れる)
+    self.profiler = None
+
+  @property
+  def team_color(self):
+    return RED if self.turn == 0 else YELLOW
+
+  @property
+  def is_over(self):
+    return self.current_end > self.max_ends
+
+  def all_stones(self):
+    all_stones = self.stones[:]
+    if self.current_stone: all_stones.append(self.current_stone)
+    return all_stones
+
+  def is_settled(self):
+    return all(s.stopped for s in self.all_stones())
+
+  def reset_end(self):
+    """ エンド開始。ハンマーを持たないチームが先攻 """
+    self.stones = []; self.thrown_count = 0
+    self.current_stone = None
+    starter = RED if self.hammer_team == YELLOW else YELLOW
+    self.turn = 0 if starter == RED else 1
+    return starter
+
+  def spawn_stone(self, x=SCREEN_W // 2):
+    self.current_stone = Stone(clamp_throw_x(x), START_Y, self.team_color)
+    return self.current_stone
+
+  def release(self, power):
+    self.current_stone.pos.x = clamp_throw_x(self.current_stone.pos.x)
+    self.current_stone.vel = Vector2(0, -power)
+    self.current_stone.stopped = False
+    self.thrown_count += 1
+
+  def snapshot(self):
+    """ 描画の補間用に今の位置を覚える """
+    return {id(s): Vector2(s.pos) for s in self.all_stones()}
+
+  def step(self, sweeping=False):
+    """ 1ステップ進める。全ストーンが止まったら True """
+    sweep_friction = FRICTION_SWEEP if sweeping else FRICTION_NORMAL
+    prof = self.profiler if self.profiler is not None and self.profiler.enabled else None
+    h = 1 / self.substeps
+    for _ in range(self.substeps):
+      if self.current_stone: self.current_stone.update(sweep_friction, h)
+      for s in self.stones: s.update(FRICTION_NORMAL, h)
+      if prof is None:
+        resolve_collisions(self.all_stones())
+      else:
+        t = time.perf_counter()
+        resolve_collisions(self.all_stones())
+        prof.add("collisions", time.perf_counter() - t)
+    self.frames += 1
+    return self.is_settled()
+
+  def finish_throw(self):
+    """ 投球を確定する。エンドの投球が終わったら True """
+    if self.current_stone: self.stones.append(self.current_stone)
+    self.current_stone = None
+    if self.thrown_count >= self.stones_per_end: return True
+    self.turn = 1 - self.turn
+    return False
+
+  def finish_end(self):
+    pts_r, pts_y = get_score(self.stones)
+    self.scores[0] += pts_r; self.scores[1] += pts_y
+    if pts_r > 0: self.hammer_team = YELLOW
+    elif pts_y > 0: self.hammer_team = RED
+    self.current_end += 1
+    return pts_r, pts_y
+
+  def run_throw(self, x, power, sweep=None, max_steps=20000):
+    """ 1投を止まるまで一気に計算し、かかったフレーム数を返す。
+    sweep の予定表はステップではなくフレーム単位 """
+    self.spawn_stone(x)
+    self.release(power)
+    start = self.frames
+    for _ in range(max_steps):
+      if self.step(sweep_at(sweep, self.frames - start)): break
+    return self.frames - start
+
+  def play_end(self, policy):
+    """ policy(sim) -> (x, power) または (x, power, sweep) で1エンドを通して打つ """
+    self.reset_end()
+    while True:
+      shot = policy(self)
+      self.run_throw(*shot)
+      if self.finish_throw(): break
+    return self.finish_end()
+
+  def play_match(self, policy):
+    while not self.is_over:
+      self.play_end(policy)
+    return tuple(self.scores)
+
+  def copy(self):
+    sim = CurlingSimulation(self.hammer_team, self.max_ends, self.stones_per_end, self.substeps)
+    sim.stones = [s.copy() for s in self.stones]
+    sim.current_stone = self.current_stone.copy() if self.current_stone else None
+    sim.thrown_count = self.thrown_count
+    sim.turn = self.turn
+    sim.current_end = self.current_end
+    sim.scores = self.scores[:]
+    sim.frames = self.frames
+    return sim
@@ -0,0 +1,139 @@
+import math
+from collections import OrderedDict
+
+import pygame as pg
+
+from config import *
+
+# --- ストーンのスプライト ---
+#
+# 3D はスケールを対数で丸めた段階ごと、上から見た図はハンドルの角度を丸めた段階ごとに
+# 色ごとの絵を1枚作っておき、ストーン1つを blit 1回で描く。画質 (段階の細かさ) は
+# STONE_QUALITY で選ぶ。
+
+# 画質ごとの (スケールの段階数 / 1オクターブ, ハンドルの角度の段階数 / 180度)
+STONE_QUALITY = {"low": (12, 24), "medium": (32, 60), "high": (64, 180)}
+# スプライトに使うメモリの上限
+SPRITE_CACHE_BYTES = 16 * 1024 * 1024
+# これより大きく映るとき (カメラの目の前) はスプライトを作らず直接描く
+SPRITE_MAX_RADIUS = 200
+# 影は画面に直接描いていたときと同じく不透明
+SHADOW_SOLID = (*SHADOW_COLOR[:3], 255)
+
+def draw_radius_for(scale, view_mode):
+  return max(2, int(STONE_RADIUS * scale * (1.5 if view_mode == "3D" else 1.0)))
+
+def draw_stone_shapes(surface, scr_pos, color, scale, view_mode, angle=0, pixel=1.0):
+  """ scr_pos を中心にストーンを描く。pixel は描画先の画面に対する倍率
+  (縮小した描画先では影のずれも縮める) """
+  draw_radius = draw_radius_for(scale, view_mode)
+
+  # 影の描画
+  if view_mode == "3D":
+    off = round(5 * pixel)
+    pg.draw.ellipse(surface, SHADOW_SOLID,
+                    (scr_pos[0] - draw_radius + off, scr_pos[1] - int(draw_radius * 0.4) + off,
+                     draw_radius * 2, int(draw_radius * 0.8)))
+  else:
+    pg.draw.circle(surface, SHADOW_SOLID,
+                   (scr_pos[0] + 3, scr_pos[1] + 3), draw_radius)
+
+  # 本体の描画
+  if view_mode == "3D":
+    rect_h = int(draw_radius * 0.7)
+    thickness = int(12 * scale)
+    pg.draw.ellipse(surface, (100, 100, 110),
+                    (scr_pos[0] - draw_radius, scr_pos[1] - rect_h // 2, draw_radius * 2, rect_h))
+    pg.draw.rect(surface, (130, 130, 140),
+                 (scr_pos[0] - draw_radius, scr_pos[1] - rect_h // 4 - thickness, draw_radius * 2, thickness))
+    top_y = scr_pos[1] - thickness
+    pg.draw.ellipse(surface, GRANITE_GRAY,
+                    (scr_pos[0] - draw_radius, top_y - rect_h // 2, draw_radius * 2, rect_h))
+    inner_r = int(draw_radius * 0.7)
+    inner_h = int(rect_h * 0.7)
+    pg.draw.ellipse(surface, color,
+                    (scr_pos[0] - inner_r, top_y - inner_h // 2, inner_r * 2, inner_h))
+    pg.draw.line(surface, (40, 40, 40), (scr_pos[0], top_y),
+                 (scr_pos[0], top_y - int(8 * scale)), int(4 * scale))
+
+    hl_w = int(draw_radius * 0.4)
+    hl_h = int(rect_h * 0.3)
+    hl_x = scr_pos[0] - int(draw_radius * 0.4)
+    hl_y = top_y - int(rect_h * 0.3)
+    s_hl = pg.Surface((hl_w * 2, hl_h * 2), pg.SRCALPHA)
+    pg.draw.ellipse(s_hl, (255, 255, 255, 120), (0, 0, hl_w, hl_h))
+    s_hl = pg.transform.rotate(s_hl, 20)
+    surface.blit(s_hl, (hl_x, hl_y))
+  else:
+    pg.draw.circle(surface, GRANITE_GRAY, scr_pos, draw_radius)
+    pg.draw.circle(surface, WHITE, scr_pos, draw_radius, 1)
+    inner_r = int(draw_radius * 0.7)
+    pg.draw.circle(surface, color, scr_pos, inner_r)
+    pg.draw.circle(surface, (255, 255, 255),
+                   (scr_pos[0] - int(inner_r * 0.3), scr_pos[1] - int(inner_r * 0.3)), int(inner_r * 0.2))
+    rad = math.radians(angle)
+    dx = inner_r * 0.8 * math.cos(rad)
+    dy = inner_r * 0.8 * math.sin(rad)
+    pg.draw.line(surface, (50, 50, 50),
+                 (scr_pos[0] - dx, scr_pos[1] - dy), (scr_pos[0] + dx, scr_pos[1] + dy), int(6 * scale))
+
+class StoneSprites:
+  """ (色, 視点, スケールの段階, 角度の段階) → (スプライト, 中心のずれ) の LRU """
+
+  def __init__(self, quality="medium", max_bytes=SPRITE_CACHE_BYTES):
+    self.set_quality(quality)
+    self.max_bytes = max_bytes
+    self.bytes = 0
+    self._sprites = OrderedDict()
+    self.hits = self.misses = 0
+
+  def set_quality(self, quality):
+    self.quality = quality
+    self.scale_steps, self.angle_steps = STONE_QUALITY[quality]
+    if hasattr(self, "_sprites"): self.clear()
+
+  def clear(self):
+    self._sprites.clear()
+    self.bytes = 0
+
+  @staticmethod
+  def _extent(scale, view_mode):
+    """ 絵の大きさと中心の位置。形はすべて中心から半径 + 数ピクセルの範囲に収まる
+    (3D は上に厚みとハンドル) """
+    r = draw_radius_for(scale, view_mode)
+    up = r + int(12 * scale) + int(8 * scale) + 8 if view_mode == "3D" else r + 4
+    return (r * 2 + 12, up + r + 8), (r + 4, up)
+
+  def _build(self, color, scale, view_mode, angle, pixel):
+    size, origin = self._extent(scale, view_mode)
+    surf = pg.Surface(size, pg.SRCALPHA)
+    draw_stone_shapes(surf, origin, color, scale, view_mode, angle, pixel)
+    return surf, origin
+
+  def draw(self, screen, scr_pos, color, scale, view_mode, angle=0, pixel=1.0):
+    """ 描いた範囲の Rect を返す """
+    if draw_radius_for(scale, view_mode) > SPRITE_MAX_RADIUS:
+      draw_stone_shapes(screen, scr_pos, color, scale, view_mode, angle, pixel)
+      (w, h), (ox, oy) = self._extent(scale, view_mode)
+      return pg.Rect(scr_pos[0] - ox, scr_pos[1] - oy, w, h)
+    bucket = round(math.log2(scale) * self.scale_steps)
+    scale = 2 ** (bucket / self.scale_steps)
+    if view_mode == "3D":
+      step = 0
+    else:
+      step = round(angle % 180 * self.angle_steps / 180) % self.angle_steps
+      angle = step * 180 / self.angle_steps
+    key = (color, view_mode, bucket, step, pixel)
+    entry = self._sprites.get(key)
+    if entry is None:
+      self.misses += 1
+      entry = self._sprites[key] = self._build(color, scale, view_mode, angle, pixel)
+      self.bytes += entry[0].get_width() * entry[0].get_height() * 4
+      while self.bytes > self.max_bytes and len(self._sprites) > 1:
+        old, _ = self._sprites.popitem(last=False)[1]
+        self.bytes -= old.get_width() * old.get_height() * 4
+    else:
+      self.hits += 1
+      self._sprites.move_to_end(key)
+    surf, (ox, oy) = entry
+    return screen.blit(surf, (scr_pos[0] - ox, scr_pos[1] - oy))
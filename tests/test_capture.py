@@ -0,0 +1,34 @@
+import json
+import os
+
+import pygame as pg
+
+from capture import Recorder
+
+def test_png_numbering_and_meta(tmp_path):
+  """ skip があっても PNG は連番で、capture.json に元のフレーム番号が残る """
+  screen = pg.Surface((40, 30), depth=32)
+  rec = Recorder(str(tmp_path), "png", skip=3, downscale=2)
+  rec.paused = True; rec.grab(screen); rec.paused = False  # 一時停止中は数えない
+  for _ in range(10): rec.grab(screen)
+  rec.close()
+  with open(tmp_path / "capture.json") as f: meta = json.load(f)
+  assert meta["frames"] == [0, 3, 6, 9]
+  assert meta["skipped"] == [1, 2, 4, 5, 7, 8]
+  assert meta["dropped"] == []
+  assert (meta["width"], meta["height"]) == (20, 15)
+  assert sorted(os.listdir(tmp_path)) == ["capture.json"] + [f"frame_{i:06d}.png" for i in range(4)]
+
+def test_dropped_frames_are_listed(tmp_path):
+  """ 書き出しが追いつかず落としたフレームは番号を残し、連番は詰める """
+  screen = pg.Surface((8, 8), depth=32)
+  rec = Recorder(str(tmp_path), "raw", pool=1)
+  rec._start(screen)
+  rec._free.get()  # バッファを全部使用中にする
+  rec.grab(screen)
+  rec._free.put(0)
+  rec.grab(screen)
+  rec.close()
+  with open(tmp_path / "capture.json") as f: meta = json.load(f)
+  assert (meta["frames"], meta["dropped"]) == ([1], [0])
+  assert os.path.getsize(tmp_path / "capture.rgb") == 8 * 8 * 3
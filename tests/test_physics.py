@@ -0,0 +1,95 @@
+import random
+
+import numpy as np
+import pytest
+
+from batch_physics import TEAM_YELLOW, BatchPhysics, simulate_shots, throw_stones
+from config import *
+from simulation import (CurlingSimulation, Stone, Vector2, resolve_collisions,
+                        resolve_collisions_all_pairs)
+
+# --- 物理の実装どうしの一致 ---
+
+def random_layout(rng, n):
+  """ ハウスの周りに重ならないように n 個置く """
+  stones = []
+  while len(stones) < n:
+    x = rng.uniform(PLAY_MIN_X + STONE_RADIUS, PLAY_MAX_X - STONE_RADIUS)
+    y = rng.uniform(TARGET_Y - 300, TARGET_Y + 300)
+    if all((s.pos - (x, y)).length() >= STONE_RADIUS * 2 for s in stones):
+      stones.append(Stone(x, y, RED if len(stones) % 2 else YELLOW))
+  return stones
+
+def python_throw(stones, x, power, sweep):
+  sim = CurlingSimulation()
+  sim.stones = [s.copy() for s in stones]
+  sim.turn = 1
+  sim.run_throw(x, power, sweep)
+  return sim.stones + [sim.current_stone]
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("sweep", [None, True])
+def test_batch_matches_python(seed, sweep):
+  """ NumPy 版は1盤面ずつ Python 版で投げた結果と位置・速度とも 1e-6 px 以内で一致する """
+  rng = random.Random(seed)
+  stones = random_layout(rng, 6)
+  xs = [rng.uniform(200, 400) for _ in range(8)]
+  powers = [rng.uniform(24, 34) for _ in range(8)]
+  phys = simulate_shots(stones, xs, powers, YELLOW, sweep)
+  for board, (x, power) in enumerate(zip(xs, powers)):
+    ref = python_throw(stones, x, power, sweep)
+    pos = np.array([(s.pos.x, s.pos.y) for s in ref])
+    vel = np.array([(s.vel.x, s.vel.y) for s in ref])
+    np.testing.assert_allclose(phys.pos[board], pos, rtol=0, atol=1e-6)
+    np.testing.assert_allclose(phys.vel[board], vel, rtol=0, atol=1e-6)
+    assert phys.out_of_play[board].tolist() == [s.out_of_play for s in ref]
+
+@pytest.mark.parametrize("seed", range(5))
+def test_grid_matches_all_pairs(seed):
+  """ グリッドの衝突判定は総当たりと同じ順で処理するので、詰まった盤面でも結果が同じ """
+  rng = random.Random(seed)
+  boards = []
+  for _ in range(2):
+    r = random.Random(seed)
+    stones = []
+    for i in range(40):
+      s = Stone(r.uniform(PLAY_MIN_X, PLAY_MAX_X), r.uniform(TARGET_Y - 400, TARGET_Y + 400),
+                RED if i % 2 else YELLOW)
+      s.vel = Vector2(r.uniform(-8, 8), r.uniform(-8, 8)); s.stopped = False
+      stones.append(s)
+    boards.append(stones)
+  for _ in range(rng.randrange(150, 250)):
+    for resolve, stones in zip((resolve_collisions, resolve_collisions_all_pairs), boards):
+      for s in stones: s.update(FRICTION_NORMAL)
+      resolve(stones)
+  for a, b in zip(*boards):
+    assert (a.pos.x, a.pos.y, a.vel.x, a.vel.y, a.out_of_play) == \
+           (b.pos.x, b.pos.y, b.vel.x, b.vel.y, b.out_of_play)
+
+# --- 物理の刻み ---
+
+@pytest.mark.parametrize("substeps", [2, 4])
+def test_substeps_keep_draws(substeps):
+  """ 刻んでも壁や衝突のない投球は同じ所に止まる (60 / 120 / 240 Hz) """
+  rng = random.Random(substeps)
+  for _ in range(10):
+    x, power = rng.uniform(100, 500), rng.uniform(15, 31)
+    ends = []
+    for n in (1, substeps):
+      sim = CurlingSimulation(substeps=n); sim.reset_end(); sim.run_throw(x, power)
+      ends.append(sim.current_stone.pos)
+    assert (ends[0] - ends[1]).length() < 0.05
+
+def test_batch_substeps_match_python():
+  rng = random.Random(0)
+  stones = random_layout(rng, 6)
+  xs = [rng.uniform(200, 400) for _ in range(4)]
+  powers = [rng.uniform(24, 34) for _ in range(4)]
+  phys = BatchPhysics.from_stones(stones, len(xs)); phys.substeps = 2
+  phys = throw_stones(phys, xs, powers, TEAM_YELLOW, False)
+  for board, (x, power) in enumerate(zip(xs, powers)):
+    sim = CurlingSimulation(substeps=2)
+    sim.stones = [s.copy() for s in stones]; sim.turn = 1
+    sim.run_throw(x, power, False)
+    ref = sim.stones + [sim.current_stone]
+    np.testing.assert_allclose(phys.pos[board], [(s.pos.x, s.pos.y) for s in ref], rtol=0, atol=1e-6)
@@ -0,0 +1,19 @@
+import pytest
+
+from config import *
+from predictor import power_for_target, stop_position
+from simulation import CurlingSimulation
+
+def simulated_stop(power, sweep):
+  sim = CurlingSimulation(); sim.reset_end(); sim.run_throw(SCREEN_W // 2, power, sweep)
+  return sim.current_stone.pos.y
+
+@pytest.mark.parametrize("power, sweep", [(20, False), (31, False), (33, False), (35, False),
+                                          (15, True), (20, True), (30, True)])
+def test_stop_position_matches_simulation(power, sweep):
+  """ 奥の壁で跳ね返る強さでも、止まる位置は1フレームずつ動かした結果と合う """
+  assert stop_position(SCREEN_W // 2, power, float(sweep))[1] == pytest.approx(
+      simulated_stop(power, sweep), abs=0.01)
+
+def test_power_for_target_clamps_behind_the_wall():
+  assert power_for_target(-100) == power_for_target(0)
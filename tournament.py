@@ -0,0 +1,211 @@
+""" 難易度どうしのボット対戦を画面なしで大量に回し、勝率・1エンドの平均得点・ハンマーでの得点率を出す
+
+  python tournament.py [--matches 1000] [--out tournament.jsonl] [--workers N]
+                       [--policy planner|heuristic] [--noise 2=30,1.5 ...] [--report]
+
+1試合ごとに --out へ1行ずつ書き足すので、途中で止めても同じコマンドでやり直せば
+残りの試合だけを打つ。--noise で NOISES の値を差し替えて比べるときは --out を分ける。
+--policy planner (既定) はゲームと同じ探索 (bot.plan_shot + NOISES) を、探索量を
+PLANNER_BUDGETS に減らしてワーカーの中で直接回す。heuristic は探索しない
+calculate_bot_strategy で、速いがゲームのボットとは別物。
+"""
+import argparse
+import concurrent.futures as cf
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+
+import bot
+from config import *
+from simulation import CurlingSimulation
+
+DIFFICULTIES = (1, 2, 3)
+# 信頼区間の z (95%)
+Z = 1.96
+# 1 度にプールへ入れておく試合数 (ワーカー数あたり)
+QUEUE_PER_WORKER = 4
+POLICIES = ("planner", "heuristic")
+# planner の探索量 (候補ショット数, ブレの試行数)。ゲームの SEARCH_BUDGETS を減らしたもの
+PLANNER_BUDGETS = {d: (max(4, count // 4), max(2, samples // 2))
+                   for d, (count, samples) in bot.SEARCH_BUDGETS.items()}
+
+class InlineExecutor:
+  """ submit したその場で計算する (ワーカーの中でさらにプロセスプールを作らない) """
+
+  def submit(self, fn, *args):
+    fut = cf.Future()
+    try: fut.set_result(fn(*args))
+    except Exception as e: fut.set_exception(e)
+    return fut
+
+def describe_policy(policy):
+  if policy == "planner":
+    budgets = ", ".join(f"{d}: {c}x{s}" for d, (c, s) in PLANNER_BUDGETS.items())
+    return f"planner (bot.plan_shot, candidates x samples {budgets})"
+  return "heuristic (bot.calculate_bot_strategy, no search)"
+
+def match_seed(seed, red, yellow, index):
+  return (seed * 1_000_003 + red * 10_007 + yellow * 101 + index) & 0xFFFFFFFF
+
+def play_match(red, yellow, index, seed, noises=None, policy="planner"):
+  """ 赤 = 難易度 red、黄 = 難易度 yellow で1試合。最初のハンマーは試合ごとに入れ替える。
+  エンドごとの (赤の得点, 黄の得点, ハンマーが赤か) を返す """
+  if noises: bot.NOISES.update(noises)
+  s = match_seed(seed, red, yellow, index)
+  rng = random.Random(s)
+  level = {RED: red, YELLOW: yellow}
+  sim = CurlingSimulation(hammer_team=YELLOW if index % 2 == 0 else RED)
+
+  inline = InlineExecutor()
+
+  def shoot(sim):
+    team = sim.team_color; d = level[team]
+    if policy == "heuristic": return bot.calculate_bot_strategy(sim.stones, d, rng, team)
+    # 時間では打ち切らない (打ち切ると結果が機械の速さで変わる)
+    plan = bot.plan_shot(sim.stones, d, team, sim.thrown_count == sim.stones_per_end - 1,
+                         seed=rng.random(), time_limit=math.inf, executor=inline,
+                         budget=PLANNER_BUDGETS[d])
+    return bot.apply_execution_noise(plan.x, plan.power, d, rng)
+
+  ends = []
+  while not sim.is_over:
+    hammer_red = sim.hammer_team == RED
+    pts_r, pts_y = sim.play_end(shoot)
+    ends.append((pts_r, pts_y, hammer_red))
+  return {"key": f"{red}-{yellow}-{index}", "policy": policy, "red": red, "yellow": yellow, "seed": s,
+          "scores": list(sim.scores), "ends": ends}
+
+# --- 結果ファイル ---
+
+def load_results(path):
+  """ 書きかけの最後の行は捨てて (ファイルも切り詰めて) 読む """
+  if not os.path.exists(path): return []
+  with open(path, "rb+") as f:
+    data = f.read()
+    end = data.rfind(b"\n") + 1
+    if end != len(data): f.truncate(end)
+  return [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+
+def run(args, noises):
+  results = load_results(args.out)
+  other = {r.get("policy", "heuristic") for r in results} - {args.policy}
+  if other:
+    sys.exit(f"{args.out} has {'/'.join(sorted(other))} results; use another --out for --policy {args.policy}")
+  done = {r["key"] for r in results}
+  jobs = [(red, yellow, i) for red, yellow in itertools.product(DIFFICULTIES, repeat=2)
+          for i in range(args.matches) if f"{red}-{yellow}-{i}" not in done]
+  total = len(done) + len(jobs)
+  print(f"{len(done)} matches already in {args.out}, {len(jobs)} to play", file=sys.stderr)
+  if not jobs: return
+  start = time.perf_counter()
+  finished = 0
+  pending = set()
+  it = iter(jobs)
+  with open(args.out, "a") as out, cf.ProcessPoolExecutor(max_workers=args.workers) as ex:
+    try:
+      while True:
+        # 全部を一度に submit せず、少しずつ入れて止めたときに捨てる量を減らす
+        for job in itertools.islice(it, args.workers * QUEUE_PER_WORKER - len(pending)):
+          pending.add(ex.submit(play_match, *job, args.seed, noises, args.policy))
+        if not pending: break
+        done_now, pending = cf.wait(pending, return_when=cf.FIRST_COMPLETED)
+        for fut in done_now:
+          out.write(json.dumps(fut.result(), separators=(",", ":")) + "\n")
+          finished += 1
+        out.flush()
+        rate = finished / (time.perf_counter() - start)
+        print(f"\r{len(done) + finished}/{total} matches, {rate:.1f}/s", end="", file=sys.stderr)
+    except KeyboardInterrupt:
+      for fut in pending: fut.cancel()
+      print(f"\ninterrupted after {finished} matches; run again to resume", file=sys.stderr)
+      raise SystemExit(130)
+  print(file=sys.stderr)
+
+# --- 集計 ---
+
+def wilson(k, n):
+  """ 割合 k / n の Wilson 信頼区間 """
+  if n == 0: return 0.0, 0.0, 0.0
+  p = k / n
+  d = 1 + Z * Z / n
+  c = (p + Z * Z / (2 * n)) / d
+  h = Z * math.sqrt(p * (1 - p) / n + Z * Z / (4 * n * n)) / d
+  return p, c - h, c + h
+
+def mean_ci(xs):
+  """ 平均と正規近似の半幅 """
+  n = len(xs)
+  if n == 0: return 0.0, 0.0
+  m = sum(xs) / n
+  if n == 1: return m, 0.0
+  var = sum((x - m) ** 2 for x in xs) / (n - 1)
+  return m, Z * math.sqrt(var / n)
+
+def pct(p):
+  return f"{p[0]:6.1%} [{p[1]:5.1%},{p[2]:5.1%}]"
+
+def report(results):
+  """ 組み合わせ (赤の難易度 vs 黄の難易度) ごとと、難易度ごとにまとめて表示する """
+  for policy in sorted({r.get("policy", "heuristic") for r in results}):
+    print(f"bot: {describe_policy(policy)}")
+  by_pair = {}
+  for r in results: by_pair.setdefault((r["red"], r["yellow"]), []).append(r)
+  print(f"{'red-yel':<8} {'n':>6} {'red win':>23} {'tie':>6} {'red pts/end':>13} "
+        f"{'yel pts/end':>13}")
+  for (red, yellow), rs in sorted(by_pair.items()):
+    wins = sum(r["scores"][0] > r["scores"][1] for r in rs)
+    ties = sum(r["scores"][0] == r["scores"][1] for r in rs)
+    pr = mean_ci([e[0] for r in rs for e in r["ends"]])
+    py = mean_ci([e[1] for r in rs for e in r["ends"]])
+    print(f"{red}-{yellow:<6} {len(rs):>6} {pct(wilson(wins, len(rs)))} {ties / len(rs):>6.1%} "
+          f"{pr[0]:>6.2f}±{pr[1]:.2f} {py[0]:>6.2f}±{py[1]:.2f}")
+
+  # 難易度ごと: ハンマーを持ったエンドで得点した割合 (1点以上 / 2点以上) と、持たずに奪った割合
+  stats = {d: {"ends": 0, "pts": [], "hammer": 0, "scored": 0, "two": 0, "steal": 0}
+           for d in DIFFICULTIES}
+  for r in results:
+    for pts_r, pts_y, hammer_red in r["ends"]:
+      for level, mine, theirs, has_hammer in ((r["red"], pts_r, pts_y, hammer_red),
+                                              (r["yellow"], pts_y, pts_r, not hammer_red)):
+        s = stats[level]
+        s["ends"] += 1; s["pts"].append(mine - theirs)
+        if has_hammer:
+          s["hammer"] += 1; s["scored"] += mine > 0; s["two"] += mine >= 2
+        else:
+          s["steal"] += mine > 0
+  print(f"\n{'level':<6} {'ends':>7} {'net pts/end':>13} {'hammer scored':>23} "
+        f"{'hammer 2+':>23} {'steal':>23}")
+  for d, s in stats.items():
+    if not s["ends"]: continue
+    net = mean_ci(s["pts"])
+    print(f"{d:<6} {s['ends']:>7} {net[0]:>+6.2f}±{net[1]:.2f} {pct(wilson(s['scored'], s['hammer']))} "
+          f"{pct(wilson(s['two'], s['hammer']))} {pct(wilson(s['steal'], s['ends'] - s['hammer']))}")
+
+def parse_noise(text):
+  """ "2=30,1.5" → (2, (30.0, 1.5)) """
+  level, values = text.split("=")
+  ax, ap = values.split(",")
+  return int(level), (float(ax), float(ap))
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--matches", type=int, default=1000, help="組み合わせごとの試合数")
+  parser.add_argument("--out", default="tournament.jsonl")
+  parser.add_argument("--workers", type=int, default=os.cpu_count())
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument("--policy", choices=POLICIES, default="planner",
+                      help="planner: ゲームと同じ探索 (探索量を減らす), heuristic: 探索しない")
+  parser.add_argument("--noise", type=parse_noise, action="append", default=[],
+                      metavar="LEVEL=X,POWER", help="難易度 LEVEL の投球のブレを差し替える")
+  parser.add_argument("--report", action="store_true", help="試合はせず集計だけ表示する")
+  args = parser.parse_args()
+
+  if not args.report: run(args, dict(args.noise))
+  report(load_results(args.out))
+
+if __name__ == "__main__":
+  main()
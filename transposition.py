@@ -0,0 +1,128 @@
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from config import *
+
+# --- 置換表 (ボットの探索結果のキャッシュ) ---
+#
+# 盤面はストーン位置をグリッドに丸め、センターラインで左右反転した2通りのうち
+# 小さい方を正規形として鍵にする。ストーンの色は「自分 / 相手」、ハンマーも
+# 「自分が持っているか」で表すので、赤黄どちらのボットでも同じ鍵になる。
+# 値は正規形の座標系での狙い (センターからの x, パワー) と期待値。
+
+# 位置を丸めるグリッドの幅
+QUANT = STONE_RADIUS / 8
+# 鍵に入るストーン数の上限 (これより多い盤面はキャッシュしない)
+MAX_KEY_STONES = STONES_PER_END
+_HEAD = struct.Struct("<BBBB")
+_STONE = struct.Struct("<hhB")
+KEY_BYTES = _HEAD.size + _STONE.size * MAX_KEY_STONES
+RECORD = np.dtype([("key", f"S{KEY_BYTES}"), ("dx", "<f4"), ("power", "<f4"),
+                   ("value", "<f4"), ("evaluated", "<i4")])
+MAGIC = b"CTT1"
+_FILE_HEAD = struct.Struct("<4sII")
+# OrderedDict の1エントリのおおよその大きさ (鍵・値・リンク)
+ENTRY_BYTES = KEY_BYTES + 200
+
+def canonical_key(stones, team, difficulty, thrown_count, hammer_team):
+  """ (鍵, 左右反転したか)。ストーンが多すぎるときは (None, False) """
+  cx = SCREEN_W // 2
+  live = [s for s in stones if not s.out_of_play]
+  if len(live) > MAX_KEY_STONES: return None, False
+  q = [(round((s.pos.x - cx) / QUANT), round(s.pos.y / QUANT), int(s.color == team))
+       for s in live]
+  head = _HEAD.pack(thrown_count & 0xff, int(hammer_team == team), difficulty, len(q))
+  pack = lambda cells: head + b"".join(_STONE.pack(*c) for c in sorted(cells))
+  key = pack(q)
+  mirrored = pack([(-dx, y, m) for dx, y, m in q])
+  if mirrored < key: return mirrored.ljust(KEY_BYTES, b"\0"), True
+  return key.ljust(KEY_BYTES, b"\0"), False
+
+class TranspositionTable:
+  """ メモリ上限付きの LRU。path を渡すとそのファイルを mmap で読み込み、
+  メモリに無い鍵はファイル側を二分探索する (起動時に全部は読まない) """
+
+  def __init__(self, max_bytes=BOT_CACHE_BYTES, path=None):
+    self.max_entries = max(1, max_bytes // ENTRY_BYTES)
+    self.path = path
+    self._lru = OrderedDict()
+    self._lock = threading.Lock()
+    self._disk = None
+    self.hits = self.misses = 0
+    if path and os.path.exists(path): self.load(path)
+
+  def __len__(self):
+    """ メモリ側とファイル側の件数の合計 (両方にある鍵は二重に数える) """
+    return len(self._lru) + (0 if self._disk is None else len(self._disk))
+
+  def load(self, path):
+    """ 保存済みの表を mmap で開く。壊れていれば無視する """
+    try:
+      with open(path, "rb") as f: magic, version, count = _FILE_HEAD.unpack(f.read(_FILE_HEAD.size))
+      if magic != MAGIC or version != KEY_BYTES or count == 0: return
+      self._disk = np.memmap(path, dtype=RECORD, mode="r", offset=_FILE_HEAD.size, shape=(count,))
+    except (OSError, struct.error, ValueError):
+      self._disk = None
+
+  def _disk_get(self, key):
+    if self._disk is None: return None
+    i = int(np.searchsorted(self._disk["key"], key))
+    if i < len(self._disk) and self._disk["key"][i] == key.rstrip(b"\0"):
+      r = self._disk[i]
+      return float(r["dx"]), float(r["power"]), float(r["value"]), int(r["evaluated"])
+    return None
+
+  def get(self, key):
+    """ (dx, power, value, evaluated) または None """
+    with self._lock:
+      entry = self._lru.get(key)
+      if entry is None:
+        entry = self._disk_get(key)
+        if entry is not None: self._put(key, entry)
+      else:
+        self._lru.move_to_end(key)
+      if entry is None: self.misses += 1
+      else: self.hits += 1
+      return entry
+
+  def put(self, key, dx, power, value, evaluated):
+    with self._lock:
+      old = self._lru.get(key)
+      # 時間切れで途中までしか評価していない結果で上書きしない
+      if old is not None and old[3] > evaluated: return
+      self._put(key, (dx, power, value, evaluated))
+
+  def _put(self, key, entry):
+    self._lru[key] = entry
+    self._lru.move_to_end(key)
+    while len(self._lru) > self.max_entries: self._lru.popitem(last=False)
+
+  def save(self, path=None):
+    """ ファイル側とメモリ側をまとめ、鍵の順に並べて書き出す """
+    path = path or self.path
+    if not path: return
+    with self._lock:
+      merged = {}
+      if self._disk is not None:
+        for r in self._disk:
+          merged[bytes(r["key"]).ljust(KEY_BYTES, b"\0")] = (
+            float(r["dx"]), float(r["power"]), float(r["value"]), int(r["evaluated"]))
+      merged.update(self._lru)
+      records = np.array([(k, *v) for k, v in sorted(merged.items())], dtype=RECORD)
+      # mmap を閉じてから置き換える (Windows では開いたままだと置き換えられない)
+      self._disk = None
+      tmp = path + ".tmp"
+      with open(tmp, "wb") as f:
+        f.write(_FILE_HEAD.pack(MAGIC, KEY_BYTES, len(records)))
+        f.write(records.tobytes())
+      os.replace(tmp, path)
+    self.load(path)
+
+  def stats(self):
+    total = self.hits + self.misses
+    return {"entries": len(self), "hits": self.hits, "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0}